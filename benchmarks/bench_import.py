@@ -0,0 +1,76 @@
+""" Import-time benchmark for ipysimulate.
+
+Measures the time of `import ipysimulate` in fresh interpreters,
+relative to `import ipywidgets` which it can't avoid, and checks that
+optional or heavy modules are not imported. Exits with status 1
+if a heavy module is imported or if the overhead exceeds `--max-ms`.
+
+Usage::
+
+    python benchmarks/bench_import.py --repeat 5 --max-ms 100 \
+        --output bench_import.json
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+# Modules that must not be imported by `import ipysimulate`
+HEAVY_MODULES = ['matplotlib', 'agentpy', 'pandas', 'numpy',
+                 'multiprocessing.shared_memory']
+
+_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'ms': 1e3 * elapsed, 'modules': sorted(sys.modules)}}))
+"""
+
+
+def measure(module):
+    """ Import `module` in a fresh interpreter and return
+    the import time in milliseconds and the imported modules. """
+    out = subprocess.run([sys.executable, '-c', _SCRIPT.format(module=module)],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='Maximum overhead over importing ipywidgets')
+    parser.add_argument('--output', default=None,
+                        help='JSON file to write results to')
+    args = parser.parse_args(argv)
+
+    base = min(measure('ipywidgets')['ms'] for _ in range(args.repeat))
+    runs = [measure('ipysimulate') for _ in range(args.repeat)]
+    total = min(run['ms'] for run in runs)
+    imported = [m for m in HEAVY_MODULES if m in runs[0]['modules']]
+
+    report = {
+        'ipywidgets_ms': base,
+        'ipysimulate_ms': total,
+        'overhead_ms': total - base,
+        'heavy_modules': imported,
+        'python': sys.version.split()[0],
+    }
+    print(f"import ipywidgets  {base:8.1f} ms\n"
+          f"import ipysimulate {total:8.1f} ms "
+          f"(+{total - base:.1f} ms)\n"
+          f"heavy modules: {', '.join(imported) if imported else 'none'}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if imported or (args.max_ms is not None
+                    and report['overhead_ms'] > args.max_ms):
+        sys.exit(1)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+""" Headless throughput benchmarks for Control and the chart widgets.
+
+The widgets are connected to a stand-in comm that serializes every message
+like the kernel would and records its size, so no browser, notebook, or
+kernel is needed. Results are written as JSON to track regressions
+across versions.
+
+Usage::
+
+    python benchmarks/bench_widgets.py --agents 1000 10000 --series 1 10 \
+        --steps 200 --output bench_widgets.json
+"""
+
+import argparse
+import json
+import numbers
+import platform
+import sys
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use('Agg')  # Render without a display
+
+import comm
+import numpy as np
+import ipywidgets
+import ipysimulate as ips
+
+
+# Stand-in comm ------------------------------------------------------------- #
+
+def _json_default(obj):
+    if isinstance(obj, numbers.Integral):
+        return int(obj)
+    if isinstance(obj, numbers.Real):
+        return float(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    # Like the kernel's serializer, fail on anything else
+    raise TypeError(f"Object of type {type(obj).__name__} "
+                    "is not JSON serializable")
+
+
+class RecordingComm(comm.base_comm.BaseComm):
+    """ Comm that serializes messages instead of publishing them,
+    and records the number of bytes per message. """
+
+    kernel = True  # Let ipywidgets send messages through this comm
+
+    def __init__(self, *args, **kwargs):
+        self.messages = []  # Bytes per message
+        super().__init__(*args, **kwargs)
+
+    def publish_msg(self, msg_type, data=None, metadata=None, buffers=None,
+                    **keys):
+        size = len(json.dumps(data, default=_json_default).encode())
+        size += sum(memoryview(b).nbytes for b in buffers or [])
+        self.messages.append(size)
+
+
+def _create_comm(*args, **kwargs):
+    return RecordingComm(*args, **kwargs)
+
+
+comm.create_comm = _create_comm
+
+
+# Synthetic model ----------------------------------------------------------- #
+
+class AttrDict(dict):
+    def __getattr__(self, k):
+        try:
+            return self[k]
+        except KeyError:
+            raise AttributeError(k)
+
+
+class SyntheticModel:
+    """ Random walk of `agents` agents with `series` global variables. """
+
+    def __init__(self, agents, series, steps):
+        self.p = AttrDict(agents=agents, series=series, steps=steps)
+        self.rng = np.random.default_rng(42)
+
+    def set_parameters(self, parameters):
+        self.p.update(parameters)
+
+    def sim_setup(self):
+        self.t = 0
+        self.running = True
+        self.xy = self.rng.random((self.p.agents, 2))
+        self.state = self.rng.integers(0, 3, self.p.agents)
+        self._update_series()
+
+    def sim_step(self):
+        self.t += 1
+        self.xy += self.rng.normal(0, 0.01, self.xy.shape)
+        flip = self.rng.random(self.p.agents) < 0.01
+        self.state[flip] = self.rng.integers(0, 3, flip.sum())
+        self._update_series()
+        if self.t >= self.p.steps:
+            self.running = False
+
+    def _update_series(self):
+        for i in range(self.p.series):
+            setattr(self, f's{i}', float(self.xy[i % len(self.xy), 0]))
+
+    @property
+    def x(self):
+        return self.xy[:, 0].tolist()
+
+    @property
+    def y(self):
+        return self.xy[:, 1].tolist()
+
+    @property
+    def grid(self):
+        counts, _, _ = np.histogram2d(self.xy[:, 0], self.xy[:, 1], bins=100)
+        return counts.astype(int)
+
+
+# Benchmarks ---------------------------------------------------------------- #
+
+def _matplot_update(model, fig, ax):
+    ax.clear()
+    ax.scatter(model.xy[:, 0], model.xy[:, 1], c=model.state, s=1)
+    fig.canvas.draw()
+
+
+CHARTS = {
+    'Lineplot': lambda c, m: ips.Lineplot(
+        c, [f's{i}' for i in range(m.p.series)]),
+    'Scatterplot': lambda c, m: ips.Scatterplot(c, 'xy', 'state'),
+    'CustomWidget': lambda c, m: ips.CustomWidget(
+        c, {}, data={'x': 'x', 'y': 'y', 'c': lambda m: m.state.tolist()}),
+    'Gridplot': lambda c, m: ips.Gridplot(c, 'grid'),
+    'Histogram': lambda c, m: ips.Histogram(
+        c, 'x', quantiles=[0.05, 0.5, 0.95]),
+    'Matplot': lambda c, m: ips.Matplot(c, _matplot_update),
+}
+
+
+def bench(chart, agents, series, steps):
+    """ Run a simulation with a single chart and measure its throughput. """
+    model = SyntheticModel(agents, series, steps)
+    # No front-end acknowledges messages, so send every frame
+    control = ips.Control(model, parameters=dict(model.p), max_in_flight=None)
+    widget = CHARTS[chart](control, model)
+
+    sync_times = []
+    sync_data = control.sync_data
+
+    def timed_sync_data(*args, **kwargs):
+        start = time.perf_counter()
+        sync_data(*args, **kwargs)
+        sync_times.append(time.perf_counter() - start)
+
+    control.sync_data = timed_sync_data
+    control.run_setup()
+    messages = widget.comm.messages if isinstance(
+        widget.comm, RecordingComm) else []
+    n_setup = len(messages)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    control.run_simulation()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sizes = messages[n_setup:]
+    return {
+        'chart': chart,
+        'agents': agents,
+        'series': series,
+        'steps': model.t,
+        'steps_per_sec': model.t / elapsed,
+        'sync_ms_mean': 1e3 * float(np.mean(sync_times)),
+        'sync_ms_p95': 1e3 * float(np.percentile(sync_times, 95)),
+        'messages': len(sizes),
+        'bytes_per_message': float(np.mean(sizes)) if sizes else 0.,
+        'bytes_per_step': sum(sizes) / model.t,
+        'peak_memory_mb': peak / 2 ** 20,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--charts', nargs='+', default=list(CHARTS),
+                        choices=list(CHARTS))
+    parser.add_argument('--agents', nargs='+', type=int, default=[1000])
+    parser.add_argument('--series', nargs='+', type=int, default=[1])
+    parser.add_argument('--steps', type=int, default=100)
+    parser.add_argument('--output', default=None,
+                        help='JSON file to write results to')
+    args = parser.parse_args(argv)
+
+    results = []
+    for chart in args.charts:
+        for agents in args.agents:
+            for series in args.series:
+                result = bench(chart, agents, series, args.steps)
+                results.append(result)
+                print(f"{chart:12} agents={agents:<7} series={series:<3} "
+                      f"{result['steps_per_sec']:9.1f} steps/s "
+                      f"{result['sync_ms_mean']:8.3f} ms/sync "
+                      f"{result['bytes_per_message']:11.0f} B/msg "
+                      f"{result['peak_memory_mb']:7.1f} MB")
+
+    report = {
+        'ipysimulate': ips.__version__,
+        'ipywidgets': ipywidgets.__version__,
+        'numpy': np.__version__,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,40 @@
+import importlib
 from ._version import __version__
-from .charts import *
 from .control import Control
 from .simulation import *
 from .parameters import *
 
+# Chart widgets are imported on first access, see __getattr__
+_lazy_attributes = {
+    'CustomWidget': 'charts',
+    'Lineplot': 'charts',
+    'Scatterplot': 'charts',
+    'Gridplot': 'charts',
+    'Histogram': 'charts',
+    'Matplot': 'charts',
+    'Playback': 'recording',
+    'Checkpoints': 'checkpoints',
+}
+
+__all__ = ['Control', 'Simulation', 'Range', 'IntRange', 'Values',
+           'sample_parameters', *_lazy_attributes]
+
+
+def __getattr__(name):
+    """ Import chart widgets and other classes when they are first accessed,
+    which keeps `import ipysimulate` fast. """
+    if name in _lazy_attributes:
+        module = importlib.import_module(f'.{_lazy_attributes[name]}', __name__)
+        value = getattr(module, name)
+        globals()[name] = value  # Skip __getattr__ next time
+        return value
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_attributes))
+
+
 def _jupyter_labextension_paths():
     """Called by Jupyter Lab Server to detect if it is a valid labextension and
     to install the widget
@@ -1,26 +1,122 @@
 import traitlets
 import ipywidgets
+import io
+import time
+import threading
+import functools
+import collections
+import numpy as np
 import ipysimulate
 from .tools import make_list
-import matplotlib.pyplot as plt
+from .history import History
+from .quantiles import QuantileSketch
+from .encoding import pack_points, pack_categories, pack_ids, \
+    pack_grid, run_lengths, encode_array, CategoryTable
 
 semver_range = "~" + ipysimulate.__version__
 
+# Arguments of matplotlib.pyplot.subplots that are not passed to the figure
+_SUBPLOTS_KWARGS = ('nrows', 'ncols', 'sharex', 'sharey', 'squeeze',
+                    'width_ratios', 'height_ratios', 'subplot_kw',
+                    'gridspec_kw')
+
 
 class Ipswidget:
 
-    def _collector(self, instr):
-        if isinstance(instr, str):
-            data_paths = instr.split('.')
+    _skipped = False  # Whether the latest frame has not been sent
+    _sweeps = False  # Whether the chart can show parameter sweeps
+
+    def _register(self, control):
+        """ Add the chart to the control panel. """
+        self._control = control
+        self._in_flight = collections.deque()  # Times of unacknowledged sends
+        control.charts.append(self)
 
-            def get(model):
-                obj = model
-                for attr in data_paths:
-                    obj = getattr(obj, attr)
-                return obj
+    def _collector(self, instr, replicates=False):
+        """ Registers a collector with the control panel and returns
+        a function that takes the model and returns the collected data.
+        Results are shared with other charts of the same control panel.
+        If `replicates` is True, the function returns a list
+        with the results of all replicates of an ensemble. """
+        collectors = self._control.collectors
+        cid = collectors.register(instr, replicates)
+        if replicates:
+            return functools.partial(collectors.get_replicates, cid)
+        return functools.partial(collectors.get, cid)
 
-            return get
-        return instr
+    def sync_data(self):
+        """ Send a frame with the current data of the simulation model,
+        unless the front-end is behind (see :func:`_ready`). """
+        self._skipped = not self._ready()
+        if not self._skipped:
+            self._send_frame()
+
+    def flush_data(self):
+        """ Send data that has been collected but not yet sent,
+        including the latest frame if it has been skipped. """
+        if self._skipped:
+            self._skipped = False
+            self._send_frame()
+
+    def _start_sweep(self):
+        """ Called before the runs of a parameter sweep
+        (see :func:`Control.sweep`). """
+        pass
+
+    def _end_sweep(self):
+        """ Called after the runs of a parameter sweep. Messages of the
+        sweep are no longer waited for, as the kernel could not receive
+        their acknowledgements while it was busy. """
+        self._in_flight.clear()
+
+    def _ready(self):
+        """ Whether fewer messages than `max_in_flight` of the control
+        panel are waiting to be acknowledged by the front-end.
+        If the oldest message has not been acknowledged after
+        `ack_timeout` seconds, e.g. because no front-end is connected,
+        the messages are no longer waited for. """
+        window = self._control.max_in_flight
+        if window is None or len(self._in_flight) < window:
+            return True
+        try:  # Acknowledgements are received on another thread
+            oldest = self._in_flight[0]
+        except IndexError:
+            return True
+        if time.time() - oldest >= self._control.ack_timeout:
+            self._in_flight.clear()
+            return True
+        return False
+
+    def _handle_frontend_msg(self, _, content, buffers):
+        """ Handles acknowledgements of the `n` messages that the front-end
+        has drawn since its last acknowledgement, and other messages
+        by calling the method of the same name as the event. """
+        event = content.get('event', '')
+        if event == 'ack':
+            for _ in range(content.get('n', 1)):
+                try:  # Cleared by the worker after a timeout
+                    self._in_flight.popleft()
+                except IndexError:
+                    break
+        else:
+            getattr(self, event)(**content)
+
+    @staticmethod
+    def _pack_numbers(values, precision, buffers):
+        """ Encode numbers with reduced precision for the front-end,
+        adding the encoded array to `buffers` and returning
+        a description of the encoding with the index of the buffer. """
+        meta, data = encode_array(values, precision)
+        meta['buffer'] = len(buffers)
+        buffers.append(data.data)
+        return meta
+
+    def _send_data(self, content, buffers=None):
+        """ Send a message to the front-end, measuring the time
+        spent on serialization if profiling is enabled. """
+        with self._control.profiler.measure(('send', self)):
+            self.send(content, buffers=buffers)
+        self._in_flight.append(time.time())
 
 
 @ipywidgets.register
@@ -47,6 +143,15 @@ class CustomWidget(ipywidgets.DOMWidget, Ipswidget):
             functions defined in `source`, using `view.model.config`.
         data (dict):
             Dictionary of variable names and ref:`collectors`.
+        precision (str or dict, optional):
+            Precision of numeric data, either for all entries of `data`
+            or as a dictionary of variable names and precisions
+            (default None). With 'float32' or 'uint16', collected arrays
+            are sent as binary buffers and passed to the `update` function
+            as a `Float32Array`, or as an array of `Float32Array` rows
+            for two-dimensional data. 'uint16' quantizes the values relative
+            to their bounding box, which is precise enough for positions
+            on a chart. If None, data is sent as JSON.
 
     """
 
@@ -61,12 +166,11 @@ class CustomWidget(ipywidgets.DOMWidget, Ipswidget):
     config = traitlets.Dict().tag(sync=True)
     source = traitlets.Dict().tag(sync=True)
 
-    def __init__(self, control, source, config=None, data=None):
+    def __init__(self, control, source, config=None, data=None,
+                 precision=None):
 
-        self._control = control
+        self._register(control)
         self._control_id = control.comm.comm_id
-
-        control.charts.append(self)
         self.model = control.model
 
         # Custom attributes
@@ -77,18 +181,35 @@ class CustomWidget(ipywidgets.DOMWidget, Ipswidget):
         self.config = config if config else {}
         data = data if data else {}
         self.collectors = {k: self._collector(v) for k, v in data.items()}
+        if isinstance(precision, dict):
+            self.precision = precision
+        else:
+            self.precision = {k: precision for k in data}
 
         super().__init__()
+        self.on_msg(self._handle_frontend_msg)
+
+    def _send_collected(self, what):
+        new_data = {}
+        arrays = {}
+        buffers = []
+        for k, v in self.collectors.items():
+            value = v(self.model)
+            precision = self.precision.get(k)
+            if precision and np.ndim(value) > 0:
+                arrays[k] = self._pack_numbers(value, precision, buffers)
+            else:
+                new_data[k] = value
+        self._send_data({"what": what, "data": new_data, "arrays": arrays},
+                        buffers=buffers)
 
-    def sync_data(self):
+    def _send_frame(self):
         """ Retrieve new data from the back-end (python) simulation model
         and send it to the front-end (javascript). """
-        new_data = {k: v(self.model) for k, v in self.collectors.items()}
-        self.send({"what": "new_data", "data": new_data})
+        self._send_collected("new_data")
 
     def reset_data(self):
-        new_data = {k: v(self.model) for k, v in self.collectors.items()}
-        self.send({"what": "reset_data", "data": new_data})
+        self._send_collected("reset_data")
 
 
 @ipywidgets.register
@@ -106,6 +227,27 @@ class Lineplot(ipywidgets.DOMWidget, Ipswidget):
             Data collector for the x axis (default 't').
         xlabel (str, optional):
             Label for the x axis (default 'Time-step t').
+        flush_interval (float, optional):
+            Maximum time in seconds that collected points are buffered
+            before they are sent to the front-end (default 0.1).
+        flush_size (int, optional):
+            Maximum number of collected points that are buffered
+            before they are sent to the front-end (default 1000).
+        precision (str, optional):
+            Precision of the points sent to the front-end (default None).
+            With 'float32' or 'uint16', points are sent as binary buffers.
+            'uint16' quantizes each block of points relative to its
+            bounding box. If None, points are sent as JSON.
+        band (tuple of float, optional):
+            Lower and upper quantile of the band around each data-series
+            if the control panel runs an ensemble of replicates
+            (default (0.05, 0.95)). The line shows the mean over
+            the replicates. If None, only the mean is shown.
+        max_history (int, optional):
+            Maximum number of points per data-series that are kept
+            in the kernel (default 1000000), see :func:`Lineplot.to_numpy`.
+            New front-ends, e.g. after a page reload, receive these points
+            in a single message. If None, all points are kept.
     """
 
     _view_name = traitlets.Unicode('LinechartView').tag(sync=True)
@@ -117,15 +259,17 @@ class Lineplot(ipywidgets.DOMWidget, Ipswidget):
     _control_id = traitlets.Unicode().tag(sync=True)
     xlabel = traitlets.Unicode().tag(sync=True)
     ylabels = traitlets.List().tag(sync=True)
+    _sweeps = True
+    _sweeping = False
 
     def __init__(self, control,
                  y, ylabel=None,
-                 x='t', xlabel=None):
+                 x='t', xlabel=None,
+                 flush_interval=0.1, flush_size=1000, precision=None,
+                 band=(0.05, 0.95), max_history=1000000):
 
-        self._control = control
+        self._register(control)
         self._control_id = control.comm.comm_id
-
-        control.charts.append(self)
         self.model = control.model
 
         # Collectors
@@ -150,35 +294,204 @@ class Lineplot(ipywidgets.DOMWidget, Ipswidget):
         else:
             raise ValueError("ylabel must be defined if y contains functions")
 
+        # Ensembles are aggregated over replicates
+        self._ensemble = control.replicates is not None
+        self.band = band if self._ensemble else None
         for ylabel, yinstr in zip(self.ylabels, yinstrs):
-            self.gety[ylabel] = self._collector(yinstr)
+            self.gety[ylabel] = self._collector(yinstr, self._ensemble)
+
+        # Buffer of collected points that have not been sent yet
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.precision = precision
+        self._clear_pending()
+
+        # Points that have been sent, as columns named after the collectors
+        self._xname = x if isinstance(x, str) else self.xlabel
+        if self._xname in self.ylabels:
+            self._xname = self.xlabel
+        columns = [self._xname] + list(self.gety)
+        if self.band:
+            columns += [f"{k} {b}" for k in self.gety for b in ('lo', 'hi')]
+        self.history = History(columns, max_length=max_history)
+        self._lock = threading.Lock()  # Orders history and sent messages
 
         super().__init__()  # **kwargs
+        self.on_msg(self._handle_frontend_msg)
+
+    def _clear_pending(self):
+        self._pending = {'x': [], 'series': {k: [] for k in self.gety}}
+        if self.band:
+            self._pending['bands'] = {k: {'lo': [], 'hi': []}
+                                      for k in self.gety}
+        self._last_flush = time.time()
+
+    def _append_ensemble(self, k, values):
+        """ Buffer the mean and band of the results of all replicates. """
+        values = np.asarray(values, dtype=float)
+        self._pending['series'][k].append(float(np.nanmean(values)))
+        if self.band:
+            lo, hi = np.nanquantile(values, self.band)
+            self._pending['bands'][k]['lo'].append(float(lo))
+            self._pending['bands'][k]['hi'].append(float(hi))
+
+    def _start_sweep(self):
+        self._sweeping = True
+
+    def _end_sweep(self):
+        super()._end_sweep()
+        self._sweeping = False
 
     def sync_data(self):
-        """ Retrieve new data from the simulation model and send it to front_end """
+        """ Retrieve new data from the simulation model
+        and send it to the front-end once enough points have been buffered. """
 
-        new_data = {
-            'x': self.getx(self.model),
-            'series': {k: gety(self.model) for k, gety in self.gety.items()}
+        self._pending['x'].append(self.getx(self.model))
+        for k, gety in self.gety.items():
+            if self._ensemble:
+                self._append_ensemble(k, gety(self.model))
+            else:
+                self._pending['series'][k].append(gety(self.model))
+        if self._sweeping:
+            self._sync_sweep()
+        elif (len(self._pending['x']) >= self.flush_size
+                or time.time() - self._last_flush >= self.flush_interval) \
+                and self._ready():
+            self.flush_data()
+
+    def _pending_columns(self):
+        """ Buffered points as columns of the history. """
+        pending = self._pending
+        columns = {self._xname: pending['x'], **pending['series']}
+        for k, band in pending.get('bands', {}).items():
+            columns[f"{k} lo"] = band['lo']
+            columns[f"{k} hi"] = band['hi']
+        return columns
+
+    def _send_arrays(self, what, columns, precision):
+        """ Send columns of points as binary buffers. """
+        buffers = []
+        pack = functools.partial(self._pack_numbers,
+                                 precision=precision, buffers=buffers)
+        arrays = {
+            "x": pack(columns[self._xname]),
+            "series": {k: pack(columns[k]) for k in self.gety}
         }
-        self.send({"what": "new_data", "data": new_data})
+        if self.band:
+            arrays["bands"] = {
+                k: {"lo": pack(columns[f"{k} lo"]),
+                    "hi": pack(columns[f"{k} hi"])}
+                for k in self.gety}
+        self._send_data({"what": what, "arrays": arrays}, buffers=buffers)
+
+    def flush_data(self):
+        """ Send all buffered points to the front-end in a single message. """
+        with self._lock:
+            if self._pending['x']:
+                columns = self._pending_columns()
+                self.history.append(columns)
+                if self.precision:
+                    self._send_arrays("new_data", columns, self.precision)
+                else:
+                    self._send_data({"what": "new_data",
+                                     "data": self._pending})
+            self._clear_pending()
+
+    def _sync_sweep(self):
+        """ Add the outcome of a finished run of a sweep, and send the
+        outcomes of all runs sorted by x, which replace the previous ones,
+        so that the lines connect them in order of x. """
+        with self._lock:
+            self.history.append(self._pending_columns())
+            self._clear_pending()
+            columns = self.history.to_numpy()
+            order = np.argsort(columns[self._xname], kind='stable')
+            self._send_history({k: v[order] for k, v in columns.items()})
+
+    def _send_history(self, columns):
+        """ Send columns of points that replace all points
+        of the front-end in a single message, as binary buffers
+        with the precision of the live points. Points that are sent
+        as JSON have full precision, so they are sent as float64. """
+        self._send_arrays("history", columns, self.precision or 'float64')
+
+    def request_history(self, **kwargs):
+        """ Send all points that have been sent so far in a single message,
+        e.g. to a front-end that has been created after a page reload. """
+        with self._lock:
+            if len(self.history):
+                self._send_history(self.history.to_numpy())
 
     def reset_data(self):
-        self.send({"what": "reset_data"})
+        with self._lock:
+            self._clear_pending()
+            self.history.clear()
+            self._send_data({"what": "reset_data"})
+
+    def to_numpy(self):
+        """ Returns the points of the chart, including buffered points
+        that have not been sent yet, as a dictionary of arrays.
+        Keys are the name of the x collector (or `xlabel` if it is a
+        function) and the labels of the data-series. If the control panel
+        runs an ensemble, the data-series are the means over the replicates,
+        and the bands are given as '<label> lo' and '<label> hi'. """
+        with self._lock:
+            data = self.history.to_numpy()
+            pending = self._pending_columns()
+        n = min(len(v) for v in pending.values())  # Skip incomplete points
+        return {k: np.concatenate([v, np.asarray(pending[k][:n], dtype=float)])
+                for k, v in data.items()}
+
+    def to_pandas(self):
+        """ Returns the points of the chart as a :class:`pandas.DataFrame`
+        indexed by the x values, see :func:`Lineplot.to_numpy`. """
+        import pandas as pd
+        return pd.DataFrame(self.to_numpy()).set_index(self._xname)
 
 
 @ipywidgets.register
 class Scatterplot(ipywidgets.DOMWidget, Ipswidget):
     """ Chart widget for a scatterplot.
 
+    Data is sent to the front-end as binary buffers,
+    with coordinates as float32 and colors as integer codes
+    that refer to a table of unique colors.
+    If agent ids are given, only the points that have been added,
+    changed, or removed since the last update are sent,
+    with a full keyframe every `keyframe_every` updates
+    and whenever a new front-end requests one, e.g. after a page reload.
+    New colors are added to the table with each update, and colors
+    that are no longer used are removed from it with each keyframe.
+
     Arguments:
         control (Control):
             The simulation control panel.
         xy (str or function):
             Data collector for the x and y coordinates (see :ref:`collectors`).
-        c (str or function):
+        c (str or function, optional):
             Data collector for the colors (see :ref:`Data Collector <collectors>`).
+            If none is passed, all points have the same color.
+        ids (str or function, optional):
+            Data collector for unique integer ids of the points
+            (default None). If given, updates only contain changed points.
+        keyframe_every (int, optional):
+            Number of updates between two full frames
+            if `ids` is given (default 100).
+        precision (str, optional):
+            Precision of the coordinates, 'float32' or 'uint16'
+            (default 'float32'). 'uint16' quantizes the coordinates
+            relative to their bounding box, which halves the size
+            of each frame.
+        renderer (str, optional):
+            How points are drawn in the front-end (default 'auto').
+            With 'svg', each point is an SVG element.
+            With 'canvas', points are drawn on a canvas,
+            which is much faster for large numbers of points.
+            With 'auto', the canvas is used if there are more
+            than `canvas_threshold` points.
+        canvas_threshold (int, optional):
+            Number of points above which the canvas is used
+            if `renderer` is 'auto' (default 2000).
     """
 
     _view_name = traitlets.Unicode('ScatterView').tag(sync=True)
@@ -187,66 +500,500 @@ class Scatterplot(ipywidgets.DOMWidget, Ipswidget):
     _model_name = traitlets.Unicode('ScatterModel').tag(sync=True)
     _model_module = traitlets.Unicode('ipysimulate').tag(sync=True)
     _model_module_version = traitlets.Unicode(semver_range).tag(sync=True)
+    renderer = traitlets.Unicode('auto').tag(sync=True)
+    canvas_threshold = traitlets.Integer(2000).tag(sync=True)
+    _sweeps = True
 
-    def __init__(self, control, xy, c):
+    def __init__(self, control, xy, c=None, ids=None, keyframe_every=100,
+                 precision='float32', renderer='auto', canvas_threshold=2000):
 
-        control.charts.append(self)
+        if renderer not in ('auto', 'svg', 'canvas'):
+            raise ValueError(f"Unknown renderer '{renderer}'. "
+                             "Choose between 'auto', 'svg', and 'canvas'.")
+        self.renderer = renderer
+        self.canvas_threshold = canvas_threshold
+
+        self._register(control)
         self._model = control.model
 
         # Collectors
         self._getxy = self._collector(xy)
-        self._getc = self._collector(c) if c else lambda: 0
+        self._getc = self._collector(c) if c else None
+        self._getids = self._collector(ids) if ids else None
 
-        #self.send({
-        #    "what": "shape",
-        #    "width": shape[0],
-        #    "height": shape[1]
-        #})
+        # State of the front-end for delta updates
+        self.keyframe_every = keyframe_every
+        self.precision = precision
+        self._clear_sent()
+        self._lock = threading.Lock()  # Orders frames and keyframe requests
 
         super().__init__()  # **kwargs
+        self.on_msg(self._handle_frontend_msg)
 
-    def sync_data(self):
+    def _clear_sent(self):
+        self._table = CategoryTable()  # Persistent color codes
+        self._sent = None  # Ids, coordinates, and codes sorted by id
+        self._sent_colors = 0  # Length of color table in the front-end
+        self._frames = 0  # Updates since the last reset
+        self._sweep = None  # Points and codes of each run of a sweep
+
+    def _start_sweep(self):
+        self._sweep = []
+
+    def _end_sweep(self):
+        super()._end_sweep()
+        self._sweep = None
+
+    def _send_frame(self):
         """ Retrieve new data from the simulation model and send it to front_end """
 
-        data = [{'x': xy[0], 'y': xy[1], 'c': c} for xy, c
-                in zip(self._getxy(self._model), self._getc(self._model))]
-        self.send({
+        xy = pack_points(self._getxy(self._model))
+        c = self._getc(self._model) if self._getc else None
+        if self._sweep is not None:
+            with self._lock:
+                self._sync_sweep(xy, c)
+            return
+        if self._getids:
+            ids = pack_ids(self._getids(self._model))
+            with self._lock:
+                self._sync_delta(ids, xy, self._table.pack(c, len(xy)))
+            return
+        colors, codes = pack_categories(c, len(xy))
+        buffers = []
+        self._send_data({
             "what": "new_data",
-            "data": data
-        })
+            "n": len(xy),
+            "xy": self._pack_numbers(xy, self.precision, buffers),
+            "colors": colors
+        }, buffers=buffers + [codes.data])
+
+    def _sync_sweep(self, xy, c):
+        """ Add the points of a finished run of a sweep,
+        and send them as a delta to the points of the previous runs. """
+        self._sweep.append((xy, c))
+        codes = np.concatenate([self._table.pack(c, len(points))
+                                for points, c in self._sweep])
+        xy = np.concatenate([points for points, _ in self._sweep])
+        self._sync_delta(np.arange(len(xy), dtype=np.int32), xy, codes)
+
+    def _send_keyframe(self, ids, xy, codes):
+        """ Send all points, after removing unused colors from the table,
+        and return the codes for the new table. """
+        codes = self._table.compact(codes)
+        self._sent_colors = len(self._table.values)
+        buffers = [ids.data]
+        self._send_data({"what": "keyframe", "n": len(ids),
+                         "xy": self._pack_numbers(xy, self.precision, buffers),
+                         "colors": self._table.values},
+                        buffers=buffers + [codes.data])
+        return codes
+
+    def _sync_delta(self, ids, xy, codes):
+        """ Send the points that differ from the front-end state,
+        or a keyframe with all points. """
+        order = np.argsort(ids, kind='stable')  # Also copies the arrays
+        ids, xy, codes = ids[order], xy[order], codes[order]
+        table = self._table
+
+        # Keyframes are also sent if the table has grown
+        # much larger than the number of points
+        if self._sent is None or self._frames % self.keyframe_every == 0 \
+                or len(table.values) > 2 * len(ids) + 256:
+            codes = self._send_keyframe(ids, xy, codes)
+        else:
+            content = {}
+            if len(table.values) > self._sent_colors:  # Only new colors
+                content['new_colors'] = table.values[self._sent_colors:]
+                self._sent_colors = len(table.values)
+            sent_ids, sent_xy, sent_codes = self._sent
+            if len(sent_ids):
+                pos = np.minimum(np.searchsorted(sent_ids, ids),
+                                 len(sent_ids) - 1)
+                changed = (sent_ids[pos] != ids) \
+                    | (sent_xy[pos] != xy).any(axis=1) \
+                    | (sent_codes[pos] != codes)
+            else:
+                changed = np.ones(len(ids), dtype=bool)
+            removed = sent_ids[~np.isin(sent_ids, ids, assume_unique=True)]
+            buffers = [ids[changed].data]
+            self._send_data({"what": "delta", "n": int(changed.sum()),
+                             "xy": self._pack_numbers(
+                                 xy[changed], self.precision, buffers),
+                             **content},
+                            buffers=buffers + [codes[changed].data,
+                                               removed.data])
+        self._sent = (ids, xy, codes)
+        self._frames += 1
+
+    def request_keyframe(self, **kwargs):
+        """ Send all points of the latest update in a keyframe,
+        e.g. to a front-end that has been created after a page reload. """
+        with self._lock:
+            if self._sent is not None:
+                ids, xy, codes = self._sent
+                self._sent = (ids, xy, self._send_keyframe(ids, xy, codes))
+
+    def reset_data(self):
+        with self._lock:
+            self._clear_sent()
+            self._send_data({"what": "reset_data"})
+
+
+@ipywidgets.register
+class Gridplot(ipywidgets.DOMWidget, Ipswidget):
+    """ Chart widget for a two-dimensional grid of values,
+    e.g. the cells of a lattice model, drawn as an image.
+
+    Grids with integer values from 0 to 255 are sent as uint8,
+    other grids as float32. Each frame is sent either in full,
+    run-length encoded, or as the cells that have changed since
+    the last frame, whichever is smallest, with a full keyframe
+    every `keyframe_every` updates and whenever a new front-end
+    requests one, e.g. after a page reload.
+
+    Arguments:
+        control (Control):
+            The simulation control panel.
+        grid (str or function):
+            Data collector for a 2D array (see :ref:`collectors`).
+        cmap (str or list, optional):
+            Colormap (default 'viridis'). A string refers to a sequential
+            color scheme of d3, like 'viridis', 'magma', or 'greys'.
+            A list of colors is used as a categorical colormap for integer
+            grids, with the cell value as the index of its color.
+        vmin (float, optional):
+            Value that is mapped to the start of the colormap.
+            If None, the minimum value since the last reset is used.
+        vmax (float, optional):
+            Value that is mapped to the end of the colormap.
+            If None, the maximum value since the last reset is used.
+        keyframe_every (int, optional):
+            Number of updates between two full frames (default 100).
+    """
+
+    _view_name = traitlets.Unicode('GridView').tag(sync=True)
+    _view_module = traitlets.Unicode('ipysimulate').tag(sync=True)
+    _view_module_version = traitlets.Unicode(semver_range).tag(sync=True)
+    _model_name = traitlets.Unicode('GridModel').tag(sync=True)
+    _model_module = traitlets.Unicode('ipysimulate').tag(sync=True)
+    _model_module_version = traitlets.Unicode(semver_range).tag(sync=True)
+    cmap = traitlets.Union([traitlets.Unicode(), traitlets.List()],
+                           default_value='viridis').tag(sync=True)
+
+    def __init__(self, control, grid, cmap='viridis', vmin=None, vmax=None,
+                 keyframe_every=100):
+
+        self._register(control)
+        self._model = control.model
+        self._getgrid = self._collector(grid)
+
+        self.cmap = cmap
+        self.vmin = vmin
+        self.vmax = vmax
+        self.keyframe_every = keyframe_every
+        self._clear_sent()
+        self._lock = threading.Lock()  # Orders frames and keyframe requests
+
+        super().__init__()  # **kwargs
+        self.on_msg(self._handle_frontend_msg)
+
+    def _clear_sent(self):
+        self._sent = None  # Last frame that has been sent
+        self._sent_range = (0, 1)  # Color range of the last frame
+        self._extent = [np.inf, -np.inf]  # Range of values since reset
+        self._frames = 0  # Updates since the last reset
+
+    def _color_range(self, grid):
+        """ Returns the values that are mapped to the ends of the colormap. """
+        if grid.dtype == np.float32:
+            finite = grid[np.isfinite(grid)]
+        else:
+            finite = grid
+        if finite.size:
+            self._extent = [min(self._extent[0], float(finite.min())),
+                            max(self._extent[1], float(finite.max()))]
+        vmin = self.vmin if self.vmin is not None else self._extent[0]
+        vmax = self.vmax if self.vmax is not None else self._extent[1]
+        if not np.isfinite(vmin) or not np.isfinite(vmax):
+            return 0, 1  # No data yet
+        return vmin, vmax
+
+    def _send_frame(self):
+        """ Retrieve the grid from the simulation model
+        and send it to the front-end. """
+
+        grid = pack_grid(self._getgrid(self._model))
+        with self._lock:
+            self._sent_range = self._color_range(grid)
+            self._send_grid(grid, self._frames % self.keyframe_every != 0)
+            self._sent = grid.copy()
+            self._frames += 1
+
+    def _send_grid(self, grid, delta):
+        """ Send a grid in its smallest encoding, which may be the
+        changes since the last frame if `delta` is True. """
+        flat = grid.reshape(-1)
+        vmin, vmax = self._sent_range
+        content = {"what": "frame", "shape": list(grid.shape),
+                   "dtype": grid.dtype.name, "vmin": vmin, "vmax": vmax}
+
+        # Choose the smallest encoding
+        values, lengths = run_lengths(flat)
+        options = [
+            (flat.nbytes, "raw", [flat]),
+            (values.nbytes + lengths.nbytes, "rle", [values, lengths])
+        ]
+        sent = self._sent
+        if delta and sent is not None and sent.shape == grid.shape \
+                and sent.dtype == grid.dtype:
+            sent = sent.reshape(-1)
+            if grid.dtype == np.float32:  # Compare bitwise, including NaN
+                changed = flat.view(np.uint32) != sent.view(np.uint32)
+            else:
+                changed = flat != sent
+            indices = np.flatnonzero(changed).astype(np.int32)
+            options.append((indices.nbytes + indices.size * flat.itemsize,
+                            "delta", [indices, flat[indices]]))
+        _, content["encoding"], buffers = min(options, key=lambda o: o[0])
+
+        self._send_data(content, buffers=[b.data for b in buffers])
+
+    def request_keyframe(self, **kwargs):
+        """ Send the latest grid in full, e.g. to a front-end
+        that has been created after a page reload. """
+        with self._lock:
+            if self._sent is not None:
+                self._send_grid(self._sent, delta=False)
 
     def reset_data(self):
-        self.sync_data()
+        with self._lock:
+            self._clear_sent()
+            self._send_data({"what": "reset_data"})
+
+
+@ipywidgets.register
+class Histogram(ipywidgets.DOMWidget, Ipswidget):
+    """ Chart widget for the distribution of a collection of values,
+    e.g. an attribute of all agents. Values are binned in the kernel,
+    so that only the counts of each bin are sent to the front-end.
 
+    Arguments:
+        control (Control):
+            The simulation control panel.
+        values (str or function):
+            Data collector for an array of values (see :ref:`collectors`).
+        bins (int or list, optional):
+            Number of bins, or a list of bin edges (default 30).
+        range (tuple, optional):
+            Lower and upper bound of the bins (default None).
+            If neither `range` nor bin edges are given, the bins are
+            adapted to cover all values since the last reset.
+        quantiles (list of float, optional):
+            Quantiles between 0 and 1 to show as vertical lines
+            (default None), e.g. `[0.05, 0.5, 0.95]`. They are estimated
+            from all values since the last reset with a
+            :class:`ipysimulate.quantiles.QuantileSketch`.
+        density (bool, optional):
+            Show the probability density instead of counts (default False).
+        xlabel (str, optional):
+            Label for the x axis. If none is passed,
+            the name of the collector is used.
+    """
 
-class Matplot(ipywidgets.Output):
+    _view_name = traitlets.Unicode('HistogramView').tag(sync=True)
+    _view_module = traitlets.Unicode('ipysimulate').tag(sync=True)
+    _view_module_version = traitlets.Unicode(semver_range).tag(sync=True)
+    _model_name = traitlets.Unicode('HistogramModel').tag(sync=True)
+    _model_module = traitlets.Unicode('ipysimulate').tag(sync=True)
+    _model_module_version = traitlets.Unicode(semver_range).tag(sync=True)
+    xlabel = traitlets.Unicode().tag(sync=True)
+
+    def __init__(self, control, values, bins=30, range=None, quantiles=None,
+                 density=False, xlabel=None):
+
+        self._register(control)
+        self._model = control.model
+        self._getvalues = self._collector(values)
+        if xlabel:
+            self.xlabel = xlabel
+        elif isinstance(values, str):
+            self.xlabel = values
+
+        self.bins = bins
+        self.range = range
+        self.quantiles = list(quantiles) if quantiles else []
+        self.density = density
+        self._clear_sent()
+
+        super().__init__()  # **kwargs
+        self.on_msg(self._handle_frontend_msg)
+
+    def _clear_sent(self):
+        self._extent = [np.inf, -np.inf]  # Range of values since reset
+        self._sketch = QuantileSketch() if self.quantiles else None
+
+    def _edges(self, values):
+        """ Returns the bin edges for the current values. """
+        if not np.isscalar(self.bins):
+            return np.asarray(self.bins, dtype=float)
+        if self.range is not None:
+            return np.linspace(*self.range, self.bins + 1)
+        if values.size:
+            self._extent = [min(self._extent[0], float(values.min())),
+                            max(self._extent[1], float(values.max()))]
+        lo, hi = self._extent
+        if not lo <= hi:  # No data yet
+            lo, hi = 0, 1
+        elif lo == hi:
+            lo, hi = lo - 0.5, hi + 0.5
+        return np.linspace(lo, hi, self.bins + 1)
+
+    def _send_frame(self):
+        """ Bin the values of the simulation model
+        and send the counts to the front-end. """
+
+        values = np.asarray(self._getvalues(self._model), dtype=float)
+        values = values[np.isfinite(values)].reshape(-1)
+        edges = self._edges(values)
+        counts, _ = np.histogram(values, bins=edges, density=self.density)
+        content = {"what": "new_data", "edges": edges.tolist(),
+                   "counts": counts.tolist()}
+        if self._sketch is not None:
+            self._sketch.update(values)
+            estimates = self._sketch.quantiles(self.quantiles)
+            content["quantiles"] = [
+                [q, v] for q, v in zip(self.quantiles, estimates.tolist())
+                if np.isfinite(v)]
+        self._send_data(content)
+
+    def reset_data(self):
+        self._clear_sent()
+        self._send_data({"what": "reset_data"})
+
+
+class Matplot(ipywidgets.Output, Ipswidget):
     """ Matplotlib subplots widget with a custom update function.
 
+    By default, the update function redraws the figure, which is then
+    re-rendered by the output widget. For figures that change every step,
+    `blit=True` renders the figure with the Agg backend, caches all static
+    content after `setup`, and only redraws the artists returned by `update`.
+    Frames are encoded on a separate thread and shown as an image.
+    If encoding falls behind the simulation, intermediate frames are skipped.
+
     Arguments:
         control (Control):
             The simulation control panel.
         update (function):
             Function that takes `(model, fig, ax)` as input.
+            With `blit=True`, it should return the artists that have
+            changed, which must be created with `animated=True`.
+            If it returns None, the whole figure is redrawn.
         *args:
             Forwarded to :func:`matplotlib.pyplot.subplots`.
-        *kwargs:
+        setup (function, optional):
+            Function that takes `(model, fig, ax)` as input and draws
+            the static content of the figure (default None). It is called
+            after the simulation has been set up. Only used if `blit=True`.
+        blit (bool, optional):
+            Whether to use blitting and off-thread encoding (default False).
+        format (str, optional):
+            Image format of encoded frames, 'png' or 'jpeg' (default 'png').
+            Only used if `blit=True`.
+        **kwargs:
             Forwarded to :func:`matplotlib.pyplot.subplots`.
     """
-    # TODO Improve description
-    def __init__(self, control, update, *args, **kwargs):
+
+    def __init__(self, control, update, *args,
+                 setup=None, blit=False, format='png', **kwargs):
+        if control.backend == 'process':
+            raise ValueError("Matplot needs the model in the kernel, "
+                             "which is not run with backend='process'.")
         super().__init__()
-        self._control = control
+        self._register(control)
         self._update = update
-
-        with self:
-            self._fig, self._ax = plt.subplots(*args, **kwargs)
-
-        control.charts.append(self)
+        self._setup = setup
+        self._blit = blit
+
+        if blit:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            # Split the arguments like pyplot.subplots, without the
+            # arguments of pyplot.figure that refer to figure managers
+            subplot_kwargs = {k: kwargs.pop(k) for k in _SUBPLOTS_KWARGS
+                              if k in kwargs}
+            kwargs.pop('num', None)
+            kwargs.pop('clear', None)
+            self._fig = Figure(**kwargs)
+            FigureCanvasAgg(self._fig)
+            self._ax = self._fig.subplots(*args, **subplot_kwargs)
+            self._format = format
+            self._image = ipywidgets.Image(format=format)
+            self.append_display_data(self._image)
+            self._background = None  # Cached static content
+            self._frame = None  # Latest frame that has not been encoded
+            self._frame_ready = threading.Condition()
+            self._encoder = None  # Encoding thread, started with first frame
+            self.dropped_frames = 0
+        else:
+            import matplotlib.pyplot as plt
+            with self:
+                self._fig, self._ax = plt.subplots(*args, **kwargs)
 
     def sync_data(self):
 
-        self._update(self._control.model, self._fig, self._ax)
+        if not self._blit:
+            self._update(self._control.model, self._fig, self._ax)
+            return
+
+        model = self._control.model
+        canvas = self._fig.canvas
+        if self._background is None:
+            if self._setup:
+                self._setup(model, self._fig, self._ax)
+            canvas.draw()  # Animated artists are excluded
+            self._background = canvas.copy_from_bbox(self._fig.bbox)
+        artists = self._update(model, self._fig, self._ax)
+        if artists is None:
+            canvas.draw()
+        else:
+            canvas.restore_region(self._background)
+            for artist in artists:
+                self._fig.draw_artist(artist)
+        self._submit_frame(np.array(canvas.buffer_rgba()))
 
     def reset_data(self):
 
-        self._ax.clear()
\ No newline at end of file
+        if self._blit:
+            for ax in self._fig.axes:
+                ax.clear()
+            self._background = None
+        else:
+            self._ax.clear()
+
+    # Off-thread encoding (blit mode) --------------------------------------- #
+
+    def _submit_frame(self, frame):
+        """ Hand a frame to the encoder, replacing a frame
+        that has not been encoded yet. """
+        with self._frame_ready:
+            if self._frame is not None:
+                self.dropped_frames += 1
+            self._frame = frame
+            self._frame_ready.notify()
+        if self._encoder is None or not self._encoder.is_alive():
+            self._encoder = threading.Thread(target=self._encode, daemon=True)
+            self._encoder.start()
+
+    def _encode(self):
+        import matplotlib.image
+        while True:
+            with self._frame_ready:
+                while self._frame is None:
+                    self._frame_ready.wait()
+                frame, self._frame = self._frame, None
+            if self._format in ('jpg', 'jpeg'):
+                frame = frame[..., :3]  # No alpha channel
+            buffer = io.BytesIO()
+            matplotlib.image.imsave(buffer, frame, format=self._format)
+            self._image.value = buffer.getvalue()
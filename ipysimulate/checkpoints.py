@@ -0,0 +1,169 @@
+import io
+import time
+import pickle
+
+
+class _Pickler(pickle.Pickler):
+    """ Pickles the state of a model, storing references
+    to the model itself (e.g. from agents) and to its parameters
+    as placeholders. """
+
+    def __init__(self, file, model):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self._model = model
+        self._parameters = getattr(model, 'p', None)
+
+    def persistent_id(self, obj):
+        if obj is self._model:
+            return 'model'
+        if obj is self._parameters and obj is not None:
+            return 'p'
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+
+    def __init__(self, file, model):
+        super().__init__(file)
+        self._model = model
+
+    def persistent_load(self, pid):
+        return self._model if pid == 'model' else self._model.p
+
+
+class Checkpoints:
+    """ Store of model snapshots, used by :class:`Control`
+    to rewind a simulation (see :func:`Control.rewind`).
+
+    A snapshot is a pickle of the model's attributes, including
+    random number generators, so that replaying the steps after a snapshot
+    leads to the same results. The attributes of the model must therefore
+    be picklable. The parameters in `model.p` are not part of a snapshot,
+    so that a restored model keeps its current parameters.
+    When the store exceeds its memory budget, snapshots are removed
+    until it fits, while the first and the latest snapshot are always
+    kept, even if they alone exceed the budget.
+
+    Arguments:
+        every (int, optional):
+            Take a snapshot at every time-step that is a multiple
+            of `every` (default 100).
+        interval (float, optional):
+            Take a snapshot if `interval` seconds have passed
+            since the last snapshot (default None).
+        max_bytes (int, optional):
+            Memory budget of all snapshots (default 256 MB).
+        thinning (str, optional):
+            Which snapshots are removed if the budget is exceeded
+            (default 'geometric'). With 'geometric', snapshots become
+            sparser the further they are in the past, so that recent
+            time-steps can be reached quickly while the whole simulation
+            remains covered. With 'lru', the least recently used
+            snapshot is removed.
+    """
+
+    def __init__(self, every=100, interval=None, max_bytes=2 ** 28,
+                 thinning='geometric'):
+        if thinning not in ('geometric', 'lru'):
+            raise ValueError(f"Unknown thinning '{thinning}'. "
+                             "Choose between 'geometric' and 'lru'.")
+        self.every = every
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.thinning = thinning
+        self.nbytes = 0
+        self._states = {}  # Time-step -> pickled model state
+        self._used = {}  # Time-step -> counter of last use
+        self._counter = 0
+        self._last_save = time.time()
+
+    def __len__(self):
+        return len(self._states)
+
+    def __repr__(self):
+        return (f"Checkpoints at {len(self)} time-steps "
+                f"({self.nbytes / 2 ** 20:.1f} MB)")
+
+    @property
+    def times(self):
+        """ list of int: Time-steps of the stored snapshots. """
+        return sorted(self._states)
+
+    def due(self, t):
+        """ Whether a snapshot should be taken at time-step `t`. """
+        if t in self._states:
+            return False
+        return bool((self.every and t % self.every == 0)
+                    or (self.interval is not None
+                        and time.time() - self._last_save >= self.interval))
+
+    def save(self, model):
+        """ Take a snapshot of `model` at its current time-step. """
+        buffer = io.BytesIO()
+        state = {k: v for k, v in model.__dict__.items() if k != 'p'}
+        _Pickler(buffer, model).dump(state)
+        state = buffer.getvalue()
+        self.discard(model.t)
+        self._states[model.t] = state
+        self.nbytes += len(state)
+        self._touch(model.t)
+        self._last_save = time.time()
+        while self.nbytes > self.max_bytes and len(self._states) > 2:
+            self.discard(self._victim())
+
+    def nearest(self, t):
+        """ Returns the latest time-step with a snapshot
+        that is not after `t`, or None if there is none. """
+        times = [s for s in self._states if s <= t]
+        return max(times) if times else None
+
+    def restore(self, model, t):
+        """ Reset the attributes of `model` to the snapshot
+        at time-step `t`, except for its parameters `model.p`.
+        Objects that refer to the model or its parameters, like agents,
+        refer to the same objects afterwards. """
+        state = _Unpickler(io.BytesIO(self._states[t]), model).load()
+        parameters = model.__dict__.get('p')
+        model.__dict__.clear()
+        model.__dict__.update(state)
+        if parameters is not None:
+            model.p = parameters
+        self._touch(t)
+
+    def discard(self, t):
+        """ Remove the snapshot at time-step `t`, if there is one. """
+        state = self._states.pop(t, None)
+        if state is not None:
+            self.nbytes -= len(state)
+            del self._used[t]
+
+    def discard_after(self, t):
+        """ Remove all snapshots after time-step `t`. """
+        for s in [s for s in self._states if s > t]:
+            self.discard(s)
+
+    def clear(self):
+        """ Remove all snapshots. """
+        self._states.clear()
+        self._used.clear()
+        self.nbytes = 0
+
+    def _touch(self, t):
+        self._counter += 1
+        self._used[t] = self._counter
+
+    def _victim(self):
+        """ Time-step of the snapshot to remove next,
+        which is neither the first nor the latest. """
+        times = self.times
+        candidates = range(1, len(times) - 1)
+        if self.thinning == 'lru':
+            return times[min(candidates, key=lambda i: self._used[times[i]])]
+
+        # Remove the snapshot whose neighbours are closest to each other,
+        # relative to its distance from the latest snapshot
+        def density(i):
+            gap = times[i + 1] - times[max(i - 1, 0)]
+            return gap / (times[-1] - times[i])
+
+        return times[min(candidates, key=density)]
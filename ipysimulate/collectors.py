@@ -0,0 +1,108 @@
+import operator
+from .stats import Profiler
+
+
+def compile_collector(instr):
+    """ Turns a :ref:`collector <collectors>` into a function
+    that takes the model as input. Strings are compiled
+    into an :func:`operator.attrgetter`, which also resolves
+    sub-attributes like `'x.y.z'`. Functions are returned unchanged. """
+    if isinstance(instr, str):
+        return operator.attrgetter(instr)
+    return instr
+
+
+class Collectors:
+    """ Registry of the data collectors that are used by the charts
+    and variables of a :class:`Control`.
+
+    Each unique collector is compiled once and identified by an integer id.
+    Results are cached per sync, so that a collector that is used
+    by multiple charts is evaluated only once.
+
+    Arguments:
+        profiler (Profiler, optional):
+            Used to measure the time spent in each collector.
+    """
+
+    def __init__(self, profiler=None):
+        self.profiler = profiler if profiler else Profiler(enabled=False)
+        self._ids = {}  # Collector instruction -> id
+        self._instrs = []  # Collector instructions, indexed by id
+        self._funcs = []  # Compiled collectors, indexed by id
+        self._cache = {}  # Results of the current sync, indexed by id
+        self._replicated = set()  # Ids that are collected from all replicates
+        self._replicates = {}  # Results of all replicates, indexed by id
+
+    def __len__(self):
+        return len(self._funcs)
+
+    def register(self, instr, replicates=False):
+        """ Adds a collector to the registry and returns its id.
+        Collectors that are already registered keep their id.
+        If `replicates` is True, the collector is evaluated for every
+        replicate of an ensemble (see :func:`get_replicates`). """
+        if instr not in self._ids:
+            self._ids[instr] = len(self._funcs)
+            self._instrs.append(instr)
+            self._funcs.append(compile_collector(instr))
+        if replicates:
+            self._replicated.add(self._ids[instr])
+        return self._ids[instr]
+
+    def replicated(self):
+        """ Returns the ids of the collectors that are evaluated
+        for every replicate of an ensemble. """
+        return sorted(self._replicated)
+
+    def instructions(self, start=0):
+        """ Returns the collector instructions with ids from `start`. """
+        return self._instrs[start:]
+
+    def get(self, cid, model):
+        """ Returns the result of collector `cid` for the current sync,
+        evaluating it for `model` if it has not been evaluated yet. """
+        try:
+            return self._cache[cid]
+        except KeyError:
+            with self.profiler.measure(('collector', cid)):
+                value = self._cache[cid] = self._funcs[cid](model)
+            return value
+
+    def evaluate(self, cid, model):
+        """ Returns the result of collector `cid` for `model`,
+        without using or updating the results of the current sync. """
+        with self.profiler.measure(('collector', cid)):
+            return self._funcs[cid](model)
+
+    def get_replicates(self, cid, model):
+        """ Returns a list with the results of collector `cid` for all
+        replicates of an ensemble in the current sync. If there are none,
+        the list contains the result for `model` (see :func:`get`). """
+        try:
+            return self._replicates[cid]
+        except KeyError:
+            return [self.get(cid, model)]
+
+    def name(self, cid):
+        """ Returns a readable name for collector `cid`. """
+        instr = self._instrs[cid]
+        if isinstance(instr, str):
+            return instr
+        return getattr(instr, '__name__', repr(instr))
+
+    def load(self, values):
+        """ Use results that have been evaluated elsewhere,
+        given as a dictionary of collector ids and results. """
+        self._cache.update(values)
+
+    def load_replicates(self, values):
+        """ Use results of all replicates of an ensemble, given as
+        a dictionary of collector ids and lists of results. """
+        self._replicates.update(values)
+
+    def clear(self):
+        """ Forget the cached results, so that collectors
+        are evaluated again with the next call of :func:`get`. """
+        self._cache.clear()
+        self._replicates.clear()
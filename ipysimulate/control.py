@@ -1,26 +1,41 @@
 import traitlets
 import ipywidgets
 import threading
+import asyncio
+import queue
 import time
+import traceback
+import concurrent.futures
 import ipysimulate
 from .tools import make_list
-from .parameters import Range, IntRange, Values
+from .collectors import Collectors
+from .stats import Profiler
+from .parameters import Range, IntRange, Values, apply_parameters, \
+    sample_parameters
 
 # See js/lib/control.js for the frontend counterpart to this file.
 semver_range = "~" + ipysimulate.__version__  # Retrieve version
 
-# Prepare parameter classes
-range_types = (Range, )
-intrange_types = (IntRange, )
-value_types = (Values, )
-try:
-    import agentpy as ap
-    if ap.__version__ >= '0.0.8':
-        range_types += (ap.Range, )
-        intrange_types += (ap.IntRange, )
-        value_types += (ap.Values, )
-except ImportError as e:
-    pass
+
+def _set_done(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _parameter_class(value):
+    """ Returns :class:`Values`, :class:`IntRange`, or :class:`Range`
+    if `value` is an instance of these classes or of their agentpy
+    counterparts, and None otherwise. agentpy is only imported
+    if an agentpy object is passed. """
+    for cls in (Values, IntRange, Range):
+        if isinstance(value, cls):
+            return cls
+    if type(value).__module__.partition('.')[0] == 'agentpy':
+        import agentpy as ap
+        for cls in (Values, IntRange, Range):
+            if isinstance(value, getattr(ap, cls.__name__, ())):
+                return cls
+    return None
 
 
 @ipywidgets.register
@@ -29,13 +44,87 @@ class Control(ipywidgets.DOMWidget):
 
     Arguments:
         model:
-            A :ref:`simulation model <simulation_model>` with discrete steps.
+            A :ref:`simulation model <simulation_model>` with discrete steps,
+            or a :class:`Playback` of a recorded simulation
+            (see :func:`Control.record`).
         parameters (dict, optional):
             Dictionary of parameter names and values (default None).
             Entries of type :class:`Range`, :class:`IntRange`,
             and :class:`Values` will be displayed as interactive widgets.
         variables (str of list of str, optional):
             Model attributes to display in the control panel (default None).
+        sync_every (int, optional):
+            Number of simulation steps between two updates
+            of the charts, variables, and callbacks
+            while the simulation is running (default 1).
+        max_sync_hz (float, optional):
+            Maximum number of updates per second while the simulation is
+            running (default None). If given, the model steps at full speed
+            and the front-end is refreshed at most at this rate.
+            A final update is always made when the simulation stops.
+        max_in_flight (int, optional):
+            Maximum number of messages per chart that have been sent
+            but not yet drawn by the front-end (default 4).
+            If the front-end falls behind, charts skip intermediate
+            frames, and line charts merge their points into the next
+            message, so that the display stays close to the simulation.
+            If None, all frames are sent.
+        ack_timeout (float, optional):
+            Seconds after which charts stop waiting for the front-end
+            to process a message (default 1), e.g. if no front-end
+            is connected.
+        backend (str, optional):
+            Where the simulation is run (default 'thread').
+            With 'thread', the model is run in a background thread
+            of the kernel. With 'process', the model and data collectors
+            are run in a child process, which keeps the kernel responsive
+            for heavy models (see :class:`ipysimulate.process.ModelProcess`).
+            Except on Linux, the model and data collectors must be
+            picklable. In this mode, :class:`Matplot` widgets are not
+            available, and callbacks see the model in the kernel,
+            which is not updated.
+        runner (str, optional):
+            How simulation commands are executed (default 'thread').
+            With 'thread', commands are executed by a worker thread.
+            With 'asyncio', commands are executed by a task
+            on the event loop of the kernel, which yields between steps.
+        executor (bool, optional):
+            If True and `runner` is 'asyncio', model setup and steps are run
+            in the default executor of the event loop (default False).
+            Use this for models whose steps block for a long time.
+        profile (bool, optional):
+            Measure the time spent in each phase of the simulation
+            (default False). The results can be accessed with
+            :attr:`Control.stats`.
+        show_stats (bool, optional):
+            Display the mean time per step and per sync in the control
+            panel (default False). Implies `profile=True`.
+        variables_hz (float, optional):
+            Maximum number of updates per second of the variables
+            in the control panel (default 10). Only variables
+            whose displayed value has changed are sent.
+        variables_precision (int, optional):
+            Number of significant digits of displayed
+            floating point variables (default 6).
+        checkpoints (int or Checkpoints, optional):
+            Take snapshots of the model while it is running,
+            every `checkpoints` steps or as configured by a
+            :class:`Checkpoints` object (default None).
+            This enables :func:`Control.rewind` and a timeline slider
+            in the control panel. Not available with `backend='process'`
+            or `replicates`.
+        replicates (int, optional):
+            Run an ensemble of this many copies of the model with
+            different seeds (default None), see
+            :class:`ipysimulate.ensemble.Ensemble`. Each copy receives
+            the parameter `seed` before its setup. :class:`Lineplot`
+            widgets show the mean of each data-series over the replicates
+            and a band between two quantiles, while other charts and
+            variables show the first replicate. With `backend='process'`,
+            each replicate is run in its own process.
+        seed (int, optional):
+            Seed from which the seeds of the replicates are derived
+            (default None). If None, the seeds are random.
     """
 
     # Traitlet declarations ------------------------------------------------- #
@@ -55,30 +144,70 @@ class Control(ipywidgets.DOMWidget):
     data_paths = traitlets.List().tag(sync=True)
     _pwidgets = traitlets.List().tag(sync=True)
     t = traitlets.Integer(0).tag(sync=True)
+    _timeline = traitlets.Bool(False).tag(sync=True)
+    _t_max = traitlets.Integer(0).tag(sync=True)
 
     name = traitlets.Unicode().tag(sync=True)
 
     # Initiation - Don't start any threads here ----------------------------- #
     
-    def __init__(self, model, parameters=None, variables=None):
+    def __init__(self, model, parameters=None, variables=None,
+                 sync_every=1, max_sync_hz=None, max_in_flight=4,
+                 ack_timeout=1, backend='thread',
+                 runner='thread', executor=False,
+                 profile=False, show_stats=False, variables_hz=10,
+                 variables_precision=6, checkpoints=None, replicates=None,
+                 seed=None):
         super().__init__()  # Initiate front-end
         self.on_msg(self._handle_button_msg)  # Handle front-end messages
-        self.thread = None  # Placeholder for simulation threads
+        self.thread = None  # Simulation worker, started with first command
+        self._commands = queue.Queue()
+        self._worker_lock = threading.Lock()
+        self._worker_stopped = False  # Whether the worker has left its loop
+        self._pending = 0  # Number of submitted but unfinished commands
+        self._pending_lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._idle_waiters = []  # Futures of coroutines that wait for idle
+        self._epoch = 0  # Number of pauses, to cancel runs queued before
+        if runner not in ('thread', 'asyncio'):
+            raise ValueError(f"Unknown runner '{runner}'. "
+                             "Choose between 'thread' and 'asyncio'.")
+        self.runner = runner
+        self.executor = executor
+        self._async_task = None  # Worker of the asyncio runner
+        self._async_loop = None
+        self._wakeup = None  # Event that is set when commands are queued
+        self._async_received = 0  # Commands taken by the asyncio worker
+        self._async_call = None  # Model method running in the executor
+        self._executor_pool = None
+        self._new_parameters = {}  # Changes that have not been applied yet
+        self._parameters_lock = threading.Lock()
+        self.sync_every = sync_every
+        self.max_sync_hz = max_sync_hz
+        self.max_in_flight = max_in_flight
+        self.ack_timeout = ack_timeout
+        self._last_sync = 0
         self._pre_pwidgets = []
         self._pdtypes = {}
 
         self.parameters = {}
+        self._space = {}  # Parameter ranges for sweeps
         if parameters:
             for k, v in parameters.items():
-                if isinstance(v, value_types):
+                parameter_class = _parameter_class(v)
+                if parameter_class is Values:
                     self._create_select(k, v)
                     self.parameters[k] = v.vdef
-                elif isinstance(v, intrange_types):
+                    self._space[k] = Values(*v.values)
+                elif parameter_class is IntRange:
                     self._create_slider(k, v, int_slider=True)
                     self.parameters[k] = v.vdef
-                elif isinstance(v, range_types):
+                    self._space[k] = IntRange(v.vmin, v.vmax)
+                elif parameter_class is Range:
                     self._create_slider(k, v)
                     self.parameters[k] = v.vdef
+                    self._space[k] = Range(v.vmin, v.vmax)
                 else:
                     self.parameters[k] = v
 
@@ -87,8 +216,53 @@ class Control(ipywidgets.DOMWidget):
         self.model.set_parameters(self.parameters)
 
         self._callbacks = []
+        self.profiler = Profiler(enabled=profile or show_stats)
+        self.show_stats = show_stats
+        self.collectors = Collectors(self.profiler)  # Shared by all charts
+
+        # Object that runs the simulation
+        if backend not in ('thread', 'process'):
+            raise ValueError(f"Unknown backend '{backend}'. "
+                             "Choose between 'thread' and 'process'.")
+        if replicates is not None:
+            if hasattr(self.model, 'seek'):
+                raise ValueError("A recorded simulation cannot be replicated.")
+            from .ensemble import Ensemble
+            self._sim = Ensemble(self.model, self.collectors, replicates,
+                                 backend=backend, seed=seed)
+        elif backend == 'thread':
+            self._sim = self.model
+        else:
+            from .process import ModelProcess
+            self._sim = ModelProcess(self.model, self.collectors)
+        self.backend = backend
+        self.replicates = replicates
+        # Whether collected data is retrieved with `_sim.collect()`
+        self._remote = hasattr(self._sim, 'collect')
+        self._playback = hasattr(self._sim, 'seek')
+        self._recorder = None
+        self._set_up = False  # Whether `_sim` has been set up once
+
+        # Model snapshots for rewinding
+        if isinstance(checkpoints, int):
+            from .checkpoints import Checkpoints
+            checkpoints = Checkpoints(every=checkpoints)
+        if checkpoints is not None and self._sim is not self.model:
+            raise ValueError("Checkpoints are not available "
+                             "with backend='process' or replicates.")
+        self.checkpoints = checkpoints
+        self._timeline = checkpoints is not None or self._playback
+
         self._var_keys = make_list(variables)
+        self._var_ids = {k: self.collectors.register(k) for k in self._var_keys}
         self._variables = {k: None for k in self._var_keys}
+        if show_stats:
+            self._variables = {**self._variables, **self._stats_variables()}
+        self.variables_hz = variables_hz
+        self.variables_precision = variables_precision
+        self._shown = {}  # Displayed text of each variable
+        self._variables_patch = {}  # Changes that have not been sent yet
+        self._last_variables = 0
 
         self.charts = []
 
@@ -97,6 +271,65 @@ class Control(ipywidgets.DOMWidget):
     def add_callback(self, func, *args, **kwargs):
         self._callbacks.append((func, args, kwargs))
 
+    # Profiling ------------------------------------------------------------- #
+
+    @property
+    def stats(self):
+        """ dict of :class:`ipysimulate.stats.Timings`: Rolling timings of
+        the model setup and steps, collectors, charts and callbacks,
+        if the control was created with `profile=True`.
+        Chart entries measure the whole chart update,
+        while send entries only measure the serialization of messages. """
+        names = {'setup': 'setup', 'step': 'step', 'sync': 'sync',
+                 'collect': 'collect (process)'}
+        for i, chart in enumerate(self.charts):
+            chart_name = f"{type(chart).__name__}[{i}]"
+            names[('chart', chart)] = f"chart {chart_name}"
+            names[('send', chart)] = f"send {chart_name}"
+        for i, (func, args, kwargs) in enumerate(self._callbacks):
+            names[('callback', i)] = \
+                f"callback {getattr(func, '__name__', i)}"
+        for cid in range(len(self.collectors)):
+            names[('collector', cid)] = \
+                f"collector {self.collectors.name(cid)}"
+        return {names.get(key, str(key)): timings
+                for key, timings in self.profiler.timings.items()}
+
+    def _stats_variables(self):
+        timings = self.profiler.timings
+        return {f'{key} (ms)': f"{timings[key].mean:.3f}"
+                if key in timings else '' for key in ('step', 'sync')}
+
+    # Variable display ---------------------------------------------------- #
+
+    def _format_variable(self, value):
+        if value is None:
+            return ''
+        if isinstance(value, float):
+            return f"{value:.{self.variables_precision}g}"
+        return str(value)
+
+    def _update_variables(self, values):
+        """ Format variables and queue those whose text has changed. """
+        for k, v in values.items():
+            text = self._format_variable(v)
+            if self._shown.get(k) != text:
+                self._shown[k] = text
+                self._variables_patch[k] = text
+        if time.time() - self._last_variables >= 1 / self.variables_hz:
+            self._send_variables()
+
+    def _send_variables(self):
+        """ Send queued variable changes to the front-end as a patch. """
+        self._last_variables = time.time()
+        if self._variables_patch:
+            patch, self._variables_patch = self._variables_patch, {}
+            self.send({'what': 'variables', 'values': patch})
+
+    def request_variables(self, **kwargs):
+        """ Send the text of all variables, e.g. to a new view. """
+        self.send({'what': 'variables', 'values': dict(self._shown)})
+
     # Parameter widgets ----------------------------------------------------- #
 
     def _create_slider(self, k, v, int_slider=False):
@@ -133,79 +366,662 @@ class Control(ipywidgets.DOMWidget):
         by calling method of same name as msg. """
         getattr(self, content.get('event', ''))(**content)
 
-    def update_parameter(self, k, v):
-        self.model.p[k] = self._pdtypes[k](v)
+    def update_parameters(self, parameters, **kwargs):
+        """ Queue parameter changes from the front-end.
+        Changes are applied together before the next simulation step. """
+        with self._parameters_lock:
+            for k, v in parameters.items():
+                self._new_parameters[k] = self._pdtypes[k](v)
+        if not self.is_running:
+            self._submit('parameters')
+
+    def update_parameter(self, k, v, **kwargs):
+        """ Queue a single parameter change (see :func:`update_parameters`). """
+        self.update_parameters({k: v})
 
     def setup_simulation(self, **kwargs):
         """ Call model setup. """
-        self.thread = threading.Thread(target=self.run_setup)
-        self.thread.start()
+        self._submit('setup')
         
     def continue_simulation(self, **kwargs):
-        """ Start background thread that runs simulation. """
-        self.thread = threading.Thread(target=self.run_simulation)
-        self.thread.start()
+        """ Start or continue to run the simulation. """
+        self._submit('run')
         
     def increment_simulation(self, **kwargs):
         """ Do a single simulation step. """
-        self.thread = threading.Thread(target=self.run_step)
-        self.thread.start()
+        self._submit('step', steps=1)
+
+    def rewind(self, t, **kwargs):
+        """ Pause the simulation and return to time-step `t`,
+        by restoring the latest checkpoint before `t` and running
+        the remaining steps (see the argument `checkpoints`).
+        If the model is a :class:`Playback`, this is the same as
+        :func:`Control.seek`. The charts are reset
+        and show the data of time-step `t` onwards.
+        The current parameters are kept, so that the steps after
+        the checkpoint are run with the values shown in the panel. """
+        self.is_running = False
+        self._submit('rewind', t=int(t))
         
     def reset_simulation(self, **kwargs):
         """ Reset graphs and simulation. """
-        self.thread = threading.Thread(target=self.reset)
-        self.thread.start()
-        
-    # Methods to be called only within threads ------------------------------ #
+        self._submit('reset')
+
+    @traitlets.observe('is_running')
+    def _is_running_changed(self, change):
+        """ A pause from the front-end or the kernel cancels runs
+        that have been queued before it. Stops of the simulation worker
+        itself (see :func:`_stop`) don't, so that queued runs
+        like `run_until(t=20)` after `run_until(t=10)` continue. """
+        if not change['new'] and not getattr(self, '_stopping', False):
+            self._epoch += 1
+            self._discard_queued({'run'})
+
+    def _stop(self):
+        """ Mark the simulation as stopped from within the worker. """
+        self._stopping = True
+        try:
+            self.is_running = False
+        finally:
+            self._stopping = False
+
+    # Simulation worker ----------------------------------------------------- #
 
-    def sync_data(self):
-        """ Retrieve new data from simulation and send it to front-end. """
-        self._variables = {k: getattr(self.model, k) for k in self._var_keys}
+    def _submit(self, command, **kwargs):
+        """ Queue a command for the simulation worker,
+        starting the worker if it is not running.
+        If `runner` is 'asyncio', the worker is a task on the event loop. """
+        if command == 'run':  # Cancelled by later pauses
+            kwargs['epoch'] = self._epoch
+        with self._pending_lock:
+            self._pending += 1
+            self._idle.clear()
+        with self._worker_lock:  # Don't queue behind a worker that stops
+            if self.runner == 'asyncio':
+                self._start_async_worker()
+            elif self.thread is None or not self.thread.is_alive() \
+                    or self._worker_stopped:
+                self._worker_stopped = False
+                self.thread = threading.Thread(target=self._work, daemon=True)
+                self.thread.start()
+            self._commands.put((command, kwargs))
+        if self.runner == 'asyncio':
+            self._async_loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _next_commands(self, block=True):
+        """ Wait for the next command and return all queued commands,
+        coalesced into a list of `(command, kwargs)`.
+        A setup or reset discards the commands that were queued before it,
+        consecutive steps are merged into a single command,
+        and only the last of consecutive runs, rewinds, or seeks is kept.
+        If `block` is False, :class:`queue.Empty` is raised
+        if no command is queued. """
+        received = [self._commands.get(block)]
+        while received[-1][0] is not None:  # Don't read beyond shutdown
+            try:
+                received.append(self._commands.get_nowait())
+            except queue.Empty:
+                break
+        commands = []
+        for command, kwargs in received:
+            if command in ('setup', 'reset'):
+                commands = []
+            if commands and command == commands[-1][0] == 'step':
+                commands[-1][1]['steps'] += kwargs['steps']
+            elif commands and command == commands[-1][0] \
+                    and command in ('run', 'rewind', 'seek'):
+                commands[-1] = (command, kwargs)
+            else:
+                commands.append((command, kwargs))
+        return commands, len(received)
+
+    def _work(self):
+        """ Execute queued commands one after another.
+        Runs in a single long-lived thread per control panel. """
+        methods = {
+            'setup': self.run_setup,
+            'run': self.run_simulation,
+            'step': self.run_step,
+            'reset': self.reset,
+            'parameters': self._apply_parameters,
+            'seek': self._seek,
+            'rewind': self._rewind
+        }
+        while True:
+            commands, received = self._next_commands()
+            for command, kwargs in commands:
+                if command is None:  # Shutdown
+                    break
+                if command == 'run' and kwargs.pop('epoch') != self._epoch:
+                    continue  # Paused after the run was queued
+                try:
+                    methods[command](**kwargs)
+                except Exception:
+                    self._stop()
+                    traceback.print_exc()
+            self._finish(received)
+            if commands and commands[-1][0] is None:
+                with self._worker_lock:
+                    if self._commands.empty():  # Else sent during shutdown
+                        self._worker_stopped = True
+                        return
+
+    def _finish(self, n):
+        """ Count `n` submitted commands as executed or discarded. """
+        with self._pending_lock:
+            self._pending -= n
+            if self._pending == 0:
+                self._idle.set()
+                waiters, self._idle_waiters = self._idle_waiters, []
+                for future in waiters:
+                    future.get_loop().call_soon_threadsafe(_set_done, future)
+
+    def _discard_queued(self, commands=None):
+        """ Remove the queued commands whose names are in `commands`,
+        or all queued commands if `commands` is None. """
+        with self._commands.mutex:
+            queued = self._commands.queue
+            kept = [c for c in queued
+                    if commands is not None and c[0] not in commands]
+            discarded = len(queued) - len(kept)
+            queued.clear()
+            queued.extend(kept)
+        if discarded:
+            self._finish(discarded)
+
+    def join(self, timeout=None):
+        """ Wait until all commands that have been sent to the simulation
+        have been executed, or until `timeout` seconds have passed.
+        With `runner='asyncio'`, the commands can't be executed
+        while the event loop is blocked, so use
+        `await control.run_until()` within the event loop instead.
+
+        Returns:
+            bool: Whether all commands have been executed.
+        """
+        if self.runner == 'asyncio' and not self._idle.is_set() \
+                and self._on_event_loop():
+            raise RuntimeError("Control.join() would block the event loop "
+                               "of the asyncio runner.")
+        return self._idle.wait(timeout)
+
+    def shutdown(self, timeout=None):
+        """ Stop a running simulation, discard queued commands,
+        and stop the simulation worker. A new worker is started
+        if the simulation receives further commands.
+        With `runner='asyncio'`, this must be called
+        from the thread of the event loop. """
+        self.is_running = False
+        self._discard_queued()
+        if self.runner == 'asyncio':
+            self._cancel_async()
+        elif self.thread is not None and self.thread.is_alive():
+            thread = self.thread
+            self._submit(None)
+            thread.join(timeout)
+        if self._sim is not self.model:
+            self._sim.close()
+        self.stop_recording()
+
+    # Methods to be called only within the simulation worker --------------- #
+
+    def sync_data(self, flush=True):
+        """ Retrieve new data from simulation and send it to front-end.
+        If `flush` is False, charts may buffer the data and send it later. """
+        self._last_sync = time.time()
+        profiler = self.profiler
+        with profiler.measure('sync'):
+            self.collectors.clear()  # Evaluate each collector once per sync
+            if self._remote:
+                with profiler.measure('collect'):
+                    self._load_collected()
+            self.t = self._sim.t
+            if self.t > self._t_max:
+                self._t_max = self.t
+            variables = {k: self.collectors.get(i, self.model)
+                         for k, i in self._var_ids.items()}
+            if self.show_stats:
+                variables.update(self._stats_variables())
+            self._update_variables(variables)
+            for chart in self.charts:
+                with profiler.measure(('chart', chart)):
+                    chart.sync_data()
+            if flush:
+                self.flush_data()
+            if self._recorder:
+                self._recorder.append(self.t, {
+                    cid: self.collectors.get(cid, self.model)
+                    for cid in range(len(self.collectors))})
+            for i, (callback, args, kwargs) in enumerate(self._callbacks):
+                with profiler.measure(('callback', i)):
+                    callback(*args, **kwargs)
+
+    def flush_data(self):
+        """ Send data that has been buffered by the charts
+        and changed variables to the front-end. """
         for chart in self.charts:
-            chart.sync_data()
-        for callback, args, kwargs in self._callbacks:
-            callback(*args, **kwargs)
+            with self.profiler.measure(('chart', chart)):
+                chart.flush_data()
+        self._send_variables()
 
-    def reset(self):
-        """ Reset simulation by clearing front-end data,
-        calling `model.sim_reset()`, and sending initial data to front-end."""
+    def _sync_due(self, steps):
+        """ Whether the front-end should be updated
+        after `steps` unsynced steps of a running simulation. """
+        if steps < self.sync_every:
+            return False
+        if self.max_sync_hz:
+            return time.time() - self._last_sync >= 1 / self.max_sync_hz
+        return True
+
+    def _apply_parameters(self):
+        """ Apply queued parameter changes to the model as one batch. """
+        with self._parameters_lock:
+            if not self._new_parameters:
+                return
+            changes, self._new_parameters = self._new_parameters, {}
+        if self._sim is self.model:
+            apply_parameters(self.model, changes)
+            if self.checkpoints is not None:  # Later snapshots are invalid
+                self.checkpoints.discard_after(self._sim.t)
+        else:
+            for k, v in changes.items():  # Keep parameters of kernel model
+                self.model.p[k] = v
+            self._sim.update_parameters(changes)
+
+    def _setup(self):
+        self._apply_parameters()
+        with self.profiler.measure('setup'):
+            self._sim.sim_setup()
+        self._set_up = True
+        self._t_max = self._sim.t_max if self._playback else 0
+        if self.checkpoints is not None:
+            self.checkpoints.clear()
+            with self.profiler.measure('checkpoint'):
+                self.checkpoints.save(self.model)
+
+    def _step(self):
+        self._apply_parameters()
+        with self.profiler.measure('step'):
+            self._sim.sim_step()
+        if self.checkpoints is not None \
+                and self.checkpoints.due(self._sim.t):
+            with self.profiler.measure('checkpoint'):
+                self.checkpoints.save(self.model)
+
+    def _load_collected(self):
+        """ Retrieve the collected data from a simulation that is not
+        run on the kernel model, like a child process or a recording. """
+        self.collectors.load(self._sim.collect(self.collectors))
+        if self.replicates:
+            self.collectors.load_replicates(self._sim.replicate_values)
+
+    def _reset_charts(self):
+        self.collectors.clear()
+        # Charts may collect data of the current state, which is not
+        # in the kernel model if the simulation is run elsewhere
+        if self._remote and (self._set_up or self._playback):
+            self._load_collected()
         for chart in self.charts:
             chart.reset_data()
-        self.run_setup()  # Reset backend model by calling setup again
+
+    def reset(self):
+        """ Reset simulation by calling `model.sim_setup()`,
+        clearing front-end data, and sending initial data to front-end."""
+        self._setup()  # Reset backend model by calling setup again
+        self._reset_charts()
+        self.sync_data()
 
     def run_setup(self):
         """ Initiate simulation by calling `model.sim_setup()`
         and sending initial data to front-end. """
-        self.model.sim_setup()
-        self.t = self.model.t
+        self._setup()
         self.sync_data()
     
-    def run_step(self):
-        """ Run a single simulation step by calling `model.sim_step()`,
+    def run_step(self, steps=1):
+        """ Run one or more simulation steps by calling `model.sim_step()`,
         and sending new data to front-end. """
-        self.model.sim_step()
-        self.t = self.model.t
+        for _ in range(steps):
+            self._step()
         self.sync_data()
+
+    def _start_run(self):
+        """ Mark the simulation as running and return the steps per second
+        given by the parameter `fps`, if there is one. """
+        self.is_running = True
+        return self.model.p.fps if 'fps' in self.model.p else None
+
+    def _run_finished(self, t=None, condition=None):
+        """ Whether a running simulation should stop before the next step. """
+        return (not self._sim.running or not self.is_running
+                or (t is not None and self._sim.t >= t)
+                or (condition is not None and condition(self.model)))
+
+    def _after_step(self, steps):
+        """ Sync data if due after `steps` unsynced steps,
+        and return the number of steps that are still unsynced. """
+        steps += 1
+        if self._sync_due(steps):
+            self.sync_data(flush=False)
+            return 0
+        return steps
+
+    def _end_run(self, steps):
+        """ Final sync after a run has stopped or was paused. """
+        if steps:
+            self.sync_data(flush=False)
+        self.flush_data()
+        self._stop()
+        if self.do_reset:
+            self.reset_simulation()
+            self.do_reset = False
         
-    def run_simulation(self):
+    def run_simulation(self, t=None, condition=None):
         """ Start or continue the simulation by repeatedly calling
-        :func:`Control.run_single_step` as long as `model.active` is True. """
-        self.is_running = True
-        if 'fps' in self.model.p:
-            while self.model.running:
-                start = time.time()
-                self.run_step()
-                wait = 1 / self.model.p.fps + start - time.time()
+        `model.sim_step()` as long as `model.running` is True,
+        until the time-step `t` is reached, or until `condition(model)`
+        returns True. The front-end is updated according to `sync_every`
+        and `max_sync_hz`, and once more when the simulation stops
+        or is paused. """
+        fps = self._start_run()
+        steps = 0  # Steps since last sync
+        while not self._run_finished(t, condition):
+            start = time.time()
+            self._step()
+            steps = self._after_step(steps)
+            if fps:
+                wait = 1 / fps + start - time.time()
                 if wait > 0:
                     time.sleep(wait)
-                if not self.is_running:
-                    break
+        self._end_run(steps)
+
+    def _seek(self, t):
+        if not self._playback:
+            raise ValueError("Seeking requires a recorded simulation, "
+                             "see ipysimulate.Playback.")
+        self._sim.seek(t)
+        self._reset_charts()
+        self.sync_data()
+
+    def _rewind(self, t):
+        if self._playback:
+            self._seek(t)
+            return
+        if self.checkpoints is None:
+            raise ValueError("Rewinding requires checkpoints, "
+                             "see the argument `checkpoints` of Control.")
+        with self.profiler.measure('rewind'):
+            saved = self.checkpoints.nearest(t)
+            if saved is None:
+                self._setup()
+            elif not saved <= self._sim.t <= t:  # Else continue from here
+                self.checkpoints.restore(self.model, saved)
+                # Attributes that depend on the kept parameters are restored
+                if hasattr(self.model, 'sim_parameters_changed'):
+                    self.model.sim_parameters_changed(dict(self.model.p))
+            while self._sim.t < t and self._sim.running:
+                self._step()
+        self._reset_charts()
+        self.sync_data()
+
+    # Recording and playback ------------------------------------------------ #
+
+    def record(self, path, chunk_size=100, compress=False):
+        """ Record the collected data of every update of the charts
+        and variables to the directory `path`, until
+        :func:`Control.stop_recording` is called. The recording can be
+        replayed without the model by passing a :class:`Playback` to a new
+        control panel with the same charts and variables.
+        Data is written in chunks of `.npz` files with one frame per update,
+        so only updates that are made according to `sync_every`
+        and `max_sync_hz` are recorded.
+
+        Arguments:
+            path (str): Directory of the recording.
+            chunk_size (int, optional): Frames per file (default 100).
+            compress (bool, optional): Whether to compress the files
+                (default False).
+        """
+        from .recording import Recorder
+        self.stop_recording()
+        self._recorder = Recorder(path, self.collectors, self.parameters,
+                                  chunk_size=chunk_size, compress=compress)
+
+    def stop_recording(self):
+        """ Stop recording and write the remaining frames to disk. """
+        if self._recorder:
+            self._recorder.close()
+            self._recorder = None
+
+    def seek(self, t, **kwargs):
+        """ Jump to the recorded time-step `t` if the model is
+        a :class:`Playback`. The charts are reset and show the data
+        of time-step `t` onwards. """
+        self._submit('seek', t=t)
+
+    # Data export ----------------------------------------------------------- #
+
+    def _line_charts(self):
+        """ Line charts by name, like 'Lineplot[0]' for the first chart. """
+        return {f"{type(chart).__name__}[{i}]": chart
+                for i, chart in enumerate(self.charts)
+                if hasattr(chart, 'to_numpy')}
+
+    def to_numpy(self):
+        """ Returns the points of all line charts as a dictionary
+        of chart names like 'Lineplot[0]', where the number is the
+        position among all charts, and dictionaries of arrays
+        (see :func:`Lineplot.to_numpy`). """
+        return {name: chart.to_numpy()
+                for name, chart in self._line_charts().items()}
+
+    def to_pandas(self):
+        """ Returns the points of all line charts as a dictionary
+        of chart names and :class:`pandas.DataFrame`
+        (see :func:`Control.to_numpy`). """
+        return {name: chart.to_pandas()
+                for name, chart in self._line_charts().items()}
+
+    # Parameter sweeps ------------------------------------------------------ #
+
+    def sweep(self, n=10, method='grid', processes=None, steps=None,
+              seed=None):
+        """ Run full simulations for a sample of the parameter ranges
+        in a pool of processes. The charts are reset and, as each run
+        finishes, its data collectors are evaluated on the final model
+        and streamed to the charts. For example, a :class:`Lineplot`
+        with `x='p.a'` and `y='b'` shows how the final value of the model
+        attribute `b` depends on the parameter `a`. Line charts connect
+        the outcomes in order of x, so their x should be the parameter
+        that is swept. Sweeps over several parameters are better shown
+        by a :class:`Scatterplot`, which shows the points of all finished runs,
+        e.g. one point per run with `xy=lambda m: [(m.p.a, m.b)]`.
+        Other charts cannot show sweeps and raise a ValueError.
+        All outcomes are sent to the front-end while the sweep is running,
+        since the kernel is busy and can't receive acknowledgements.
+
+        Arguments:
+            n (int, optional):
+                Sample size, see :func:`sample_parameters` (default 10).
+            method (str, optional):
+                Sampling method 'grid', 'random', or 'lhs' (default 'grid').
+            processes (int, optional):
+                Number of processes (default None).
+                If None, the number of CPUs is used.
+                Except on Linux, the model and data collectors
+                must be picklable.
+            steps (int, optional):
+                Maximum number of steps per run (default None).
+                If None, each run continues as long as `model.running`.
+            seed (int, optional):
+                Seed for the random sample (default None).
+
+        Returns:
+            list of tuple: The parameters of each run and a dictionary
+            of collector instructions and the collected data,
+            in the order in which the runs have finished.
+        """
+        from .process import run_sweep
+        unsupported = [type(chart).__name__ for chart in self.charts
+                       if not chart._sweeps]
+        if unsupported:
+            raise ValueError("Parameter sweeps can't be shown by "
+                             f"{', '.join(unsupported)}.")
+        self.is_running = False  # Pause running simulation
+        if self.runner == 'asyncio':
+            self._cancel_async()  # Its run can't end while the loop waits
         else:
-            while self.model.running:
-                self.run_step()
-                if not self.is_running:
-                    break
-        self.is_running = False
-        if self.do_reset:
-            self.reset_simulation()
-            self.do_reset = False
+            self.join()
+        samples = [{**self.parameters, **sample}
+                   for sample in sample_parameters(
+                       self._space, n, method=method, seed=seed)]
+        self._reset_charts()
+        instrs = self.collectors.instructions()
+        results = []
+        max_in_flight, self.max_in_flight = self.max_in_flight, None
+        for chart in self.charts:
+            chart._start_sweep()
+        try:
+            for parameters, values in run_sweep(
+                    self.model, self.collectors, samples, processes, steps):
+                self.collectors.clear()
+                self.collectors.load(values)
+                for chart in self.charts:
+                    chart.sync_data()
+                results.append((parameters,
+                                {instrs[cid]: v for cid, v in values.items()}))
+            self.flush_data()
+        finally:
+            self.max_in_flight = max_in_flight
+            for chart in self.charts:
+                chart._end_sweep()
+        return results
+
+    # Asyncio runner -------------------------------------------------------- #
+
+    def _on_event_loop(self):
+        """ Whether this is called within the event loop of the worker. """
+        try:
+            return asyncio.get_running_loop() is self._async_loop
+        except RuntimeError:
+            return False
+
+    def _start_async_worker(self):
+        """ Create the task of the asyncio runner if it is not running. """
+        if self._async_task is None or self._async_task.done():
+            self._async_loop = asyncio.get_event_loop()
+            self._wakeup = asyncio.Event()
+            self._async_task = self._async_loop.create_task(
+                self._work_async())
+
+    def _cancel_async(self):
+        """ Cancel the task of the asyncio runner, abandoning the command
+        that it is executing, after waiting for a model method
+        that is running in the executor. Queued commands are executed
+        by a new task once the event loop is free again. """
+        task, self._async_task = self._async_task, None
+        if task is None or task.done():
+            return
+        task.cancel()
+        if self._async_call is not None:
+            concurrent.futures.wait([self._async_call])
+        received, self._async_received = self._async_received, 0
+        self._finish(received)
+        if not self._commands.empty():  # Executed when the loop is free
+            self._start_async_worker()
+            self._wakeup.set()
+
+    async def _work_async(self):
+        """ Asynchronous version of :func:`_work`, which executes queued
+        commands one after another in a single task per control panel. """
+        while True:
+            self._wakeup.clear()
+            try:
+                commands, received = self._next_commands(block=False)
+            except queue.Empty:
+                await self._wakeup.wait()
+                continue
+            self._async_received = received
+            for command, kwargs in commands:
+                if command == 'run' and kwargs.pop('epoch') != self._epoch:
+                    continue  # Paused after the run was queued
+                try:
+                    await self._execute_async(command, kwargs)
+                except Exception:
+                    self._stop()
+                    traceback.print_exc()
+            self._async_received = 0
+            self._finish(received)
+
+    async def _wait_idle(self):
+        """ Wait until all commands have been executed. """
+        with self._pending_lock:
+            if self._pending == 0:
+                return
+            future = asyncio.get_running_loop().create_future()
+            self._idle_waiters.append(future)
+        await future
+
+    async def _call_async(self, func):
+        """ Call a blocking model method,
+        in a thread of the executor if `executor` is True. """
+        if not self.executor:
+            func()
+            return
+        if self._executor_pool is None:
+            self._executor_pool = concurrent.futures.ThreadPoolExecutor(1)
+        call = self._async_call = self._executor_pool.submit(func)
+        try:
+            await asyncio.wrap_future(call)
+        finally:
+            if self._async_call is call:
+                self._async_call = None
+
+    async def _execute_async(self, command, kwargs):
+        """ Execute a command within the task of the asyncio runner. """
+        if command == 'run':
+            await self._run_async(**kwargs)
+            return
+        if command == 'parameters':
+            self._apply_parameters()
+            return
+        if command == 'seek':
+            self._seek(**kwargs)
+            return
+        if command == 'rewind':
+            await self._call_async(lambda: self._rewind(**kwargs))
+            return
+        if command in ('setup', 'reset'):
+            await self._call_async(self._setup)
+            if command == 'reset':
+                self._reset_charts()
+        else:
+            for _ in range(kwargs['steps']):
+                await self._call_async(self._step)
+        self.sync_data()
+
+    async def _run_async(self, t=None, condition=None):
+        """ Asynchronous version of :func:`Control.run_simulation`,
+        which yields to the event loop between steps. """
+        fps = self._start_run()
+        steps = 0  # Steps since last sync
+        while not self._run_finished(t, condition):
+            start = time.time()
+            await self._call_async(self._step)
+            steps = self._after_step(steps)
+            wait = 1 / fps + start - time.time() if fps else 0
+            await asyncio.sleep(max(wait, 0))  # Yield to event loop
+        self._end_run(steps)
+
+    async def run_until(self, t=None, condition=None):
+        """ Run the simulation until the time-step `t` is reached,
+        `condition(model)` returns True, the model stops,
+        or the simulation is paused. Must be awaited, e.g.
+        `await control.run_until(t=100)` in a notebook cell.
+        The run starts after all commands that have been sent before,
+        and the call returns when all sent commands have been executed.
+        Multiple control panels can be driven from one coroutine. """
+        self._submit('run', t=t, condition=condition)
+        if self.runner == 'asyncio':
+            await self._wait_idle()
+        else:
+            await asyncio.get_event_loop().run_in_executor(None, self.join)
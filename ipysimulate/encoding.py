@@ -0,0 +1,135 @@
+import numpy as np
+
+# See js/lib/encoding.js for the frontend counterpart to this file.
+
+
+def pack_points(xy):
+    """ Packs a collection of (x, y) coordinates
+    into a contiguous float32 array of shape (n, 2). """
+    points = np.asarray(xy, dtype=np.float32)
+    return np.ascontiguousarray(points.reshape(-1, 2))
+
+
+def encode_array(values, precision):
+    """ Encodes numbers for the front-end with reduced precision.
+    With 'float64', values are sent at full precision.
+    With 'float32', values are converted to 32-bit floats.
+    With 'uint16', values are quantized to 16-bit integers
+    relative to the bounding box of each column, so that the error
+    is at most 1/131068 of the column's range. Non-finite values
+    are encoded as 65535 and decoded as NaN.
+    See `decode_array` in encoding.js.
+
+    Returns:
+        tuple: A JSON description of the encoding and the encoded array.
+    """
+    if precision in ('float32', 'float64'):
+        data = np.ascontiguousarray(values, dtype=precision)
+        return {'dtype': precision, 'shape': list(data.shape)}, data
+    if precision != 'uint16':
+        raise ValueError(f"Unknown precision '{precision}'. "
+                         "Choose between 'float64', 'float32', and 'uint16'.")
+    values = np.asarray(values, dtype=np.float64)
+    columns = values.reshape(len(values), int(np.prod(values.shape[1:])))
+    finite = np.isfinite(columns)
+    lo = np.where(finite, columns, np.inf).min(axis=0, initial=np.inf)
+    hi = np.where(finite, columns, -np.inf).max(axis=0, initial=-np.inf)
+    lo[~np.isfinite(lo)] = 0  # Columns without finite values
+    span = np.where(hi > lo, hi - lo, 1)
+    with np.errstate(invalid='ignore'):
+        quantized = np.rint((columns - lo) / span * 65534)
+    quantized[~finite] = 65535
+    data = np.ascontiguousarray(quantized, dtype=np.uint16)
+    return {'dtype': 'uint16', 'shape': list(values.shape),
+            'lo': lo.tolist(), 'hi': (lo + span).tolist()}, data
+
+
+def pack_categories(values, n):
+    """ Packs a collection of categories (e.g. colors) of length `n`
+    into a small table of unique values and an int32 array of codes.
+
+    Returns:
+        tuple: The table as a list and the codes as an array.
+    """
+    if values is None:
+        return [0], np.zeros(n, dtype=np.int32)
+    values = np.asarray(values)
+    if values.ndim == 0:  # Single category for all points
+        return [values.item()], np.zeros(n, dtype=np.int32)
+    table, codes = np.unique(values, return_inverse=True)
+    return table.tolist(), codes.astype(np.int32).reshape(-1)
+
+
+class CategoryTable:
+    """ Table of categories (e.g. colors) that keeps the code of each
+    category across frames, so that codes of different frames can be
+    compared and only new categories need to be sent when it grows.
+    Categories that are no longer used can be removed with :func:`compact`. """
+
+    def __init__(self):
+        self.values = []  # Categories, indexed by code
+        self._codes = {}  # Category -> code
+
+    def pack(self, values, n):
+        """ Returns int32 codes for a collection of categories
+        of length `n`, adding new categories to the table. """
+        if values is None:
+            values = 0
+        values = np.asarray(values)
+        if values.ndim == 0:  # Single category for all points
+            return np.full(n, self._code(values.item()), dtype=np.int32)
+        table, inverse = np.unique(values, return_inverse=True)
+        lookup = np.array([self._code(v) for v in table.tolist()],
+                          dtype=np.int32)
+        return lookup[inverse.reshape(-1)]
+
+    def compact(self, codes):
+        """ Keep only the categories of `codes`,
+        and return the codes for the smaller table. """
+        used, inverse = np.unique(codes, return_inverse=True)
+        self.values = [self.values[code] for code in used.tolist()]
+        self._codes = {value: code for code, value in enumerate(self.values)}
+        return inverse.astype(np.int32).reshape(-1)
+
+    def _code(self, value):
+        try:
+            return self._codes[value]
+        except KeyError:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+            return code
+
+
+def pack_ids(ids):
+    """ Packs a collection of integer ids into an int32 array. """
+    ids = np.asarray(ids).reshape(-1)
+    packed = ids.astype(np.int32)
+    if len(ids) and not np.array_equal(packed, ids):
+        raise ValueError("Ids must be integers between -2**31 and 2**31-1.")
+    return packed
+
+
+def pack_grid(values):
+    """ Packs a 2D array into a contiguous uint8 array if all values
+    are integers from 0 to 255, or into a float32 array otherwise. """
+    grid = np.asarray(values)
+    if grid.ndim != 2:
+        raise ValueError(f"Grid must be two-dimensional, not {grid.ndim}D.")
+    if grid.dtype == bool or (
+            grid.dtype.kind in 'iu' and
+            (not grid.size or (grid.min() >= 0 and grid.max() <= 255))):
+        return np.ascontiguousarray(grid, dtype=np.uint8)
+    return np.ascontiguousarray(grid, dtype=np.float32)
+
+
+def run_lengths(flat):
+    """ Run-length encodes a 1D array, comparing values bitwise.
+
+    Returns:
+        tuple of numpy.ndarray: The value and int32 length of each run.
+    """
+    bits = flat.view(np.uint32) if flat.dtype == np.float32 else flat
+    starts = np.flatnonzero(bits[1:] != bits[:-1]) + 1
+    starts = np.concatenate([[0], starts]) if len(flat) else starts
+    lengths = np.diff(np.append(starts, len(flat))).astype(np.int32)
+    return flat[starts], lengths
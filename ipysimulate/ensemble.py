@@ -0,0 +1,127 @@
+import copy
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from .parameters import apply_parameters
+
+
+class Ensemble:
+    """ Runs replicates of a simulation model with different seeds.
+    Used by :class:`Control` with the argument `replicates`.
+
+    Before each setup, every replicate receives a new parameter `seed`,
+    derived from the seed of the ensemble. The replicates are stepped
+    together as long as at least one of them is running.
+    Collectors that are registered with `replicates=True`
+    (see :func:`Collectors.register`) are evaluated for every replicate
+    that took part in the latest step, all other collectors
+    only for the first replicate.
+
+    Arguments:
+        model: The simulation model, which is used as the first replicate.
+        collectors (Collectors): The data collectors of the control panel.
+        n (int): Number of replicates.
+        backend (str, optional):
+            Where the replicates are run (default 'thread'). With 'thread',
+            the model is copied and the replicates are stepped one after
+            another. With 'process', each replicate is run in its own
+            :class:`ipysimulate.process.ModelProcess`,
+            and the replicates are stepped in parallel.
+        seed (int, optional):
+            Seed from which the seeds of the replicates are derived
+            (default None). If None, the seeds are random.
+    """
+
+    def __init__(self, model, collectors, n, backend='thread', seed=None):
+        if n < 1:
+            raise ValueError("An ensemble needs at least one replicate.")
+        self.model = model
+        self.collectors = collectors
+        self.backend = backend
+        if backend == 'process':
+            from .process import ModelProcess
+            self.replicates = [ModelProcess(model, collectors)
+                               for _ in range(n)]
+            self._pool = ThreadPoolExecutor(n)  # Waits on child processes
+        else:
+            self.replicates = [model] + [copy.deepcopy(model)
+                                         for _ in range(n - 1)]
+            self._pool = None
+        self._seeds = np.random.SeedSequence(seed)
+        self._active = self.replicates  # Replicates of the latest step
+        self.replicate_values = {}  # Results of the latest collect
+        self.running = False
+        self.t = 0
+
+    def __len__(self):
+        return len(self.replicates)
+
+    def _map(self, func, replicates):
+        """ Call `func` for each replicate, in parallel for processes. """
+        if self._pool is None:
+            return [func(r) for r in replicates]
+        return list(self._pool.map(func, replicates))
+
+    def _update(self):
+        self.running = any(r.running for r in self.replicates)
+        self.t = max(r.t for r in self._active)
+
+    def sim_setup(self):
+        seeds = [int(s.generate_state(1)[0])
+                 for s in self._seeds.spawn(len(self))]
+        for replicate, seed in zip(self.replicates, seeds):
+            self._set_parameters(replicate, {'seed': seed})
+        self._active = self.replicates
+        self._map(lambda r: r.sim_setup(), self.replicates)
+        self._update()
+
+    def sim_step(self):
+        self._active = [r for r in self.replicates if r.running]
+        self._map(lambda r: r.sim_step(), self._active)
+        self._update()
+
+    def _set_parameters(self, replicate, parameters):
+        if self._pool is None:
+            apply_parameters(replicate, parameters)
+        else:
+            replicate.update_parameters(parameters)
+
+    def update_parameters(self, parameters):
+        for replicate in self.replicates:
+            self._set_parameters(replicate, parameters)
+
+    def collect(self, collectors):
+        """ Evaluate the data collectors.
+
+        Arguments:
+            collectors (Collectors): The data collectors of the control panel.
+
+        Returns:
+            dict: Results of the first replicate by collector id.
+            The results of all replicates that took part in the latest step
+            are stored in :attr:`replicate_values` as lists
+            for the collectors with `replicates=True`.
+        """
+        cids = collectors.replicated()
+        first = self.replicates[0]
+        if self._pool is None:
+            values = {cid: collectors.evaluate(cid, first)
+                      for cid in range(len(collectors))}
+            others = [{cid: collectors.evaluate(cid, r) for cid in cids}
+                      for r in self._active if r is not first]
+        else:
+            results = self._map(
+                lambda r: r.collect(collectors,
+                                    None if r is first else cids),
+                [first] + [r for r in self._active if r is not first])
+            values, others = results[0], results[1:]
+        if first in self._active:
+            others = [values] + others
+        self.replicate_values = {cid: [v[cid] for v in others]
+                                 for cid in cids}
+        return values
+
+    def close(self):
+        """ Stop the child processes of the replicates, if there are any. """
+        if self._pool is not None:
+            for replicate in self.replicates:
+                replicate.close()
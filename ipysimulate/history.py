@@ -0,0 +1,76 @@
+import numpy as np
+
+
+class History:
+    """ Columnar store of the points of a chart, used by :class:`Lineplot`
+    to send its full history to new front-ends and to export its data.
+
+    Each column is a preallocated NumPy array of floats, whose capacity
+    is doubled when it is full, so that appending is amortized constant
+    time. Missing values like None are stored as NaN.
+
+    Arguments:
+        columns (list of str): Names of the columns.
+        max_length (int, optional):
+            Maximum number of rows (default None). If exceeded,
+            the oldest rows are dropped. If None, all rows are kept.
+        capacity (int, optional): Initial number of rows (default 1024).
+    """
+
+    def __init__(self, columns, max_length=None, capacity=1024):
+        self.columns = list(columns)
+        self.max_length = max_length
+        self._capacity = capacity
+        self._arrays = {k: np.empty(capacity) for k in self.columns}
+        self._start = 0  # Index of the oldest row that is kept
+        self._end = 0  # Index after the latest row
+
+    def __len__(self):
+        return self._end - self._start
+
+    def __repr__(self):
+        return f"History with {len(self)} rows of {self.columns}"
+
+    def _reserve(self, n):
+        """ Make room for `n` more rows, moving the kept rows to the front
+        of new arrays with doubled capacity if the arrays are full.
+        If the number of rows is bounded, the capacity is at least twice
+        the number of kept rows, so that they are moved only occasionally. """
+        if self._end + n <= self._capacity:
+            return
+        size = len(self) + n
+        if self.max_length is not None:
+            size *= 2
+        capacity = self._capacity
+        while capacity < size:
+            capacity *= 2
+        for k, array in self._arrays.items():
+            new = np.empty(capacity)
+            new[:len(self)] = array[self._start:self._end]
+            self._arrays[k] = new
+        self._end -= self._start
+        self._start = 0
+        self._capacity = capacity
+
+    def append(self, values):
+        """ Add rows, given as a dictionary with a sequence
+        of equal length for each column. """
+        n = len(values[self.columns[0]])
+        if n == 0:
+            return
+        self._reserve(n)
+        for k in self.columns:
+            self._arrays[k][self._end:self._end + n] = np.asarray(
+                values[k], dtype=float)
+        self._end += n
+        if self.max_length is not None and len(self) > self.max_length:
+            self._start = self._end - self.max_length
+
+    def clear(self):
+        """ Remove all rows, keeping the allocated arrays. """
+        self._start = self._end = 0
+
+    def to_numpy(self):
+        """ Returns a dictionary with a copy of each column. """
+        return {k: array[self._start:self._end].copy()
+                for k, array in self._arrays.items()}
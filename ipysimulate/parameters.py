@@ -1,3 +1,18 @@
+import itertools
+
+__all__ = ['Range', 'IntRange', 'Values', 'sample_parameters']
+
+
+def apply_parameters(model, parameters):
+    """ Apply a batch of parameter changes to a model by updating `model.p`,
+    and call `model.sim_parameters_changed(parameters)` if the model
+    defines such a method, so that it can react once per batch. """
+    for k, v in parameters.items():
+        model.p[k] = v
+    if hasattr(model, 'sim_parameters_changed'):
+        model.sim_parameters_changed(parameters)
+
+
 
 class Range:
     """ A range of parameter values
@@ -66,4 +81,61 @@ class Values:
         return len(self.values)
 
     def __repr__(self):
-        return f"Set of {len(self.values)} parameter values"
\ No newline at end of file
+        return f"Set of {len(self.values)} parameter values"
+
+
+def sample_parameters(space, n, method='grid', seed=None):
+    """ Create a sample of parameter combinations.
+
+    Arguments:
+        space (dict):
+            Dictionary of parameter names and values of type
+            :class:`Range`, :class:`IntRange`, or :class:`Values`.
+        n (int):
+            With 'grid', the number of values per :class:`Range` or
+            :class:`IntRange`, while all entries of :class:`Values` are used.
+            Otherwise, the number of parameter combinations.
+        method (str, optional):
+            'grid' for all combinations of evenly spaced values,
+            'random' for random values, or
+            'lhs' for a latin hypercube sample (default 'grid').
+        seed (int, optional):
+            Seed for the random number generator (default None).
+
+    Returns:
+        list of dict: Parameter combinations.
+    """
+    import numpy as np
+    keys = list(space)
+    if method == 'grid':
+        axes = []
+        for v in space.values():
+            if isinstance(v, Values):
+                axes.append(list(v.values))
+            elif v.ints:
+                axes.append(sorted(set(
+                    int(round(x)) for x in np.linspace(v.vmin, v.vmax, n))))
+            else:
+                axes.append(np.linspace(v.vmin, v.vmax, n).tolist())
+        return [dict(zip(keys, c)) for c in itertools.product(*axes)]
+
+    rng = np.random.default_rng(seed)
+    if method == 'random':
+        units = rng.random((len(keys), n))
+    elif method == 'lhs':  # One value per stratum and dimension
+        units = (np.array([rng.permutation(n) for _ in keys]).reshape(-1, n)
+                 + rng.random((len(keys), n))) / n
+    else:
+        raise ValueError(f"Unknown method '{method}'. "
+                         "Choose between 'grid', 'random', and 'lhs'.")
+    columns = []
+    for v, u in zip(space.values(), units):
+        if isinstance(v, Values):
+            columns.append([v.values[i] for i in (u * len(v)).astype(int)])
+        elif v.ints:
+            columns.append(np.minimum(
+                v.vmin + (u * (v.vmax - v.vmin + 1)).astype(int),
+                v.vmax).tolist())
+        else:
+            columns.append((v.vmin + u * (v.vmax - v.vmin)).tolist())
+    return [dict(zip(keys, c)) for c in zip(*columns)] if keys else [{}] * n
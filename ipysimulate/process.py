@@ -0,0 +1,237 @@
+import sys
+import multiprocessing
+import traceback
+import collections
+import numpy as np
+from multiprocessing import shared_memory
+from .parameters import apply_parameters
+
+# Arrays smaller than this are sent through the pipe instead of shared memory
+SHARED_MIN_BYTES = 1 << 16
+
+# Reference to an array in a shared memory block
+SharedArray = collections.namedtuple('SharedArray', ['name', 'shape', 'dtype'])
+
+
+def _attach(name):
+    """ Attach to a shared memory block that is owned by the child process,
+    without registering it with the resource tracker of this process. """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        from multiprocessing import resource_tracker
+        block = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+
+def _share(value, cid, blocks):
+    """ Write large arrays into a shared memory block per collector,
+    and return a reference to the block instead of the array. """
+    if not isinstance(value, np.ndarray) or value.dtype.hasobject \
+            or value.nbytes < SHARED_MIN_BYTES:
+        return value
+    block = blocks.get(cid)
+    if block is None or block.size < value.nbytes:
+        if block is not None:
+            block.close()
+            block.unlink()
+        block = blocks[cid] = shared_memory.SharedMemory(
+            create=True, size=value.nbytes)
+    np.ndarray(value.shape, value.dtype, buffer=block.buf)[...] = value
+    return SharedArray(block.name, value.shape, value.dtype.str)
+
+
+def _serve(conn, model, collectors):
+    """ Main loop of the child process. Executes commands
+    from the kernel process on the model, and replies with
+    `(True, result)` or `(False, traceback)`. """
+    blocks = {}
+    try:
+        while True:
+            command, arg = conn.recv()
+            if command == 'close':
+                break
+            try:
+                if command == 'setup':
+                    model.sim_setup()
+                elif command == 'step':
+                    model.sim_step()
+                elif command == 'parameters':
+                    apply_parameters(model, arg)
+                elif command == 'collect':
+                    new, cids = arg
+                    for instr in new:  # Collectors added after start
+                        collectors.register(instr)
+                    if cids is None:
+                        cids = range(len(collectors))
+                    collectors.clear()
+                    values = {cid: _share(collectors.get(cid, model),
+                                          cid, blocks)
+                              for cid in cids}
+                    conn.send((True, values))
+                    continue
+                conn.send((True, (getattr(model, 'running', False),
+                                  getattr(model, 't', 0))))  # Before setup
+            except Exception:
+                conn.send((False, traceback.format_exc()))
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+
+
+def get_context():
+    """ Multiprocessing context that forks on Linux, so that models
+    and collectors don't need to be picklable. Other platforms use their
+    default start method, as forking the multi-threaded kernel process
+    is unsafe on macOS. """
+    fork = sys.platform.startswith('linux')
+    return multiprocessing.get_context('fork' if fork else None)
+
+
+class ModelProcess:
+    """ Runs a simulation model and its data collectors in a child process.
+    Used by :class:`Control` with `backend='process'`.
+
+    The child process is started with the first call of :func:`sim_setup`.
+    If it has been stopped with :func:`close`, it is started again
+    by the next call, and the model is set up again before a step.
+    On Linux, it is forked from the kernel process, so that the model
+    and collectors don't need to be picklable. On other platforms,
+    they are pickled, so collectors can't be lambda functions.
+    Collected arrays are returned as views on shared memory,
+    which stay valid until the next call of :func:`collect`.
+
+    Arguments:
+        model: The simulation model.
+        collectors (Collectors): The data collectors of the control panel.
+    """
+
+    def __init__(self, model, collectors):
+        self.model = model
+        self.collectors = collectors
+        self.running = False
+        self.t = 0
+        self._process = None
+        self._conn = None
+        self._known = 0  # Number of collectors known to the child process
+        self._blocks = {}  # Attached shared memory blocks by name
+
+    def _start(self):
+        ctx = get_context()
+        self._conn, child_conn = ctx.Pipe()
+        self._known = len(self.collectors)
+        self._process = ctx.Process(
+            target=_serve, args=(child_conn, self.model, self.collectors),
+            daemon=True)
+        self._process.start()
+        child_conn.close()
+
+    def _call(self, command, arg=None):
+        self._conn.send((command, arg))
+        ok, result = self._conn.recv()
+        if not ok:
+            raise RuntimeError(f"Error in simulation process:\n{result}")
+        return result
+
+    def _read(self, value):
+        if not isinstance(value, SharedArray):
+            return value
+        name, shape, dtype = value
+        if name not in self._blocks:
+            self._blocks[name] = _attach(name)
+        return np.ndarray(shape, dtype, buffer=self._blocks[name].buf)
+
+    def _ensure_started(self):
+        """ Start the child process if it is not running,
+        and return whether it has been started. """
+        if self._process is None or not self._process.is_alive():
+            self._start()
+            return True
+        return False
+
+    def _ensure_set_up(self):
+        if self._ensure_started():
+            self.running, self.t = self._call('setup')
+
+    def sim_setup(self):
+        self._ensure_started()
+        self.running, self.t = self._call('setup')
+
+    def sim_step(self):
+        self._ensure_set_up()
+        self.running, self.t = self._call('step')
+
+    def update_parameters(self, parameters):
+        self._ensure_started()
+        self._call('parameters', parameters)
+
+    def collect(self, collectors, cids=None):
+        """ Evaluate data collectors in the child process.
+
+        Arguments:
+            collectors (Collectors): The data collectors of the control panel.
+                Collectors that have been registered since the last call
+                are sent to the child process.
+            cids (list of int, optional): Ids of the collectors to evaluate
+                (default None). If None, all collectors are evaluated.
+
+        Returns:
+            dict: Results by collector id.
+        """
+        self._ensure_set_up()
+        new = collectors.instructions(self._known)
+        self._known += len(new)
+        values = self._call('collect', (new, cids))
+        names = {v[0] for v in values.values() if isinstance(v, SharedArray)}
+        for name in list(self._blocks):  # Blocks replaced by the child
+            if name not in names and cids is None:
+                self._close_block(name)
+        return {cid: self._read(v) for cid, v in values.items()}
+
+    def _close_block(self, name):
+        try:
+            self._blocks.pop(name).close()
+        except BufferError:  # Arrays that still refer to the block
+            pass
+
+    def close(self):
+        """ Stop the child process and release shared memory. """
+        if self._process is not None and self._process.is_alive():
+            self._conn.send(('close', None))
+            self._process.join()
+        self._process = None
+        for name in list(self._blocks):
+            self._close_block(name)
+
+
+# Parameter sweeps ---------------------------------------------------------- #
+
+_sweep = {}  # Model, collectors, and steps of the current worker process
+
+
+def _init_sweep(model, collectors, steps):
+    _sweep.update(model=model, collectors=collectors, steps=steps)
+
+
+def _run_sweep(parameters):
+    """ Run a single simulation of a sweep and collect its final data. """
+    model, collectors, steps = _sweep['model'], _sweep['collectors'], \
+        _sweep['steps']
+    model.set_parameters(parameters)
+    model.sim_setup()
+    while model.running and (steps is None or model.t < steps):
+        model.sim_step()
+    collectors.clear()
+    return parameters, {cid: collectors.get(cid, model)
+                        for cid in range(len(collectors))}
+
+
+def run_sweep(model, collectors, samples, processes=None, steps=None):
+    """ Run simulations for each parameter combination in `samples`
+    in a pool of processes, and yield the parameters and collected data
+    of each run as soon as it has finished. """
+    with get_context().Pool(processes, initializer=_init_sweep,
+                            initargs=(model, collectors, steps)) as pool:
+        yield from pool.imap_unordered(_run_sweep, samples)
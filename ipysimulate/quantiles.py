@@ -0,0 +1,59 @@
+import numpy as np
+
+
+class QuantileSketch:
+    """ Streaming estimate of the quantiles of all values that have been
+    added, in bounded memory. Similar to a KLL sketch, values are kept
+    in levels of compactors with at most `k` items each. When a level is
+    full, it is sorted and every second item is kept, at random offset,
+    and moved to the next level with twice the weight.
+
+    Arguments:
+        k (int, optional): Capacity of each level (default 200).
+            Larger values give more accurate estimates.
+        seed (int, optional): Seed for the random offsets.
+    """
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.count = 0  # Number of added values
+        self._levels = []  # Arrays of items, level i has weight 2**i
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.count
+
+    def update(self, values):
+        """ Add an array of values, ignoring non-finite values. """
+        values = np.asarray(values, dtype=float).reshape(-1)
+        values = values[np.isfinite(values)]
+        self.count += len(values)
+        self._add(0, values)
+
+    def _add(self, level, values):
+        if level == len(self._levels):
+            self._levels.append(values[:0])
+        items = np.concatenate([self._levels[level], values])
+        if len(items) <= self.k:
+            self._levels[level] = items
+            return
+        items.sort()
+        if len(items) % 2:  # Keep one item at this level
+            self._levels[level], items = items[-1:], items[:-1]
+        else:
+            self._levels[level] = items[:0]
+        self._add(level + 1, items[self._rng.integers(2)::2])
+
+    def quantiles(self, q):
+        """ Estimates of the quantiles `q` (between 0 and 1),
+        or NaN if no values have been added. """
+        q = np.asarray(q, dtype=float)
+        if not self.count:
+            return np.full(q.shape, np.nan)
+        items = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(len(level), 2 ** i)
+                                  for i, level in enumerate(self._levels)])
+        order = np.argsort(items)
+        cumulative = np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, q * cumulative[-1])
+        return items[order][np.minimum(positions, len(items) - 1)]
@@ -0,0 +1,201 @@
+import os
+import json
+import collections
+import numbers
+import numpy as np
+
+# Layout of a recording directory:
+# - meta.json: Collector names, parameters, and an index of the chunks.
+# - chunk_000000.npz, ...: Collected data of `chunk_size` syncs each.
+#   Collectors with scalar values are stored as one column per chunk,
+#   other values as one array per collector and frame.
+
+
+class Recorder:
+    """ Writes the collected data of each sync of a :class:`Control`
+    to a directory of chunked `.npz` files, see :func:`Control.record`.
+
+    Arguments:
+        path (str): Directory of the recording.
+        collectors (Collectors): Data collectors of the control panel.
+        parameters (dict, optional): Parameters to store with the recording.
+        chunk_size (int, optional): Frames per chunk (default 100).
+        compress (bool, optional): Whether to compress chunks (default False).
+    """
+
+    def __init__(self, path, collectors, parameters=None, chunk_size=100,
+                 compress=False):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.collectors = collectors
+        self.chunk_size = chunk_size
+        self.compress = compress
+        self._meta = {
+            'version': 1,
+            'collectors': [],
+            'parameters': parameters if parameters else {},
+            'chunks': []
+        }
+        self._frames = []  # Frames of the current chunk as (t, values)
+
+    def append(self, t, values):
+        """ Add a frame with time-step `t` and a dictionary
+        of collector ids and collected data. """
+        frame = {}
+        for cid, value in values.items():
+            if isinstance(value, np.ndarray):
+                frame[cid] = ('array', np.array(value))  # Copy shared memory
+            elif isinstance(value, (numbers.Number, str, bool)) \
+                    or value is None:
+                frame[cid] = ('scalar', value)
+            else:
+                frame[cid] = ('list', np.asarray(value))
+        self._frames.append((t, frame))
+        if len(self._frames) >= self.chunk_size:
+            self._write_chunk()
+
+    def _write_chunk(self):
+        if not self._frames:
+            return
+        arrays = {'t': np.array([t for t, _ in self._frames])}
+        kinds = {}
+        for cid in self._frames[0][1]:
+            frames = [frame[cid] for _, frame in self._frames]
+            kind = frames[0][0]
+            if any(k != kind for k, _ in frames):
+                kind = 'list'
+            kinds[cid] = kind
+            if kind == 'scalar':
+                arrays[f'c{cid}'] = np.array([v for _, v in frames])
+            else:
+                for i, (_, value) in enumerate(frames):
+                    arrays[f'c{cid}_{i}'] = np.asarray(value)
+        file = f'chunk_{len(self._meta["chunks"]):06d}.npz'
+        save = np.savez_compressed if self.compress else np.savez
+        save(os.path.join(self.path, file), **arrays)
+        self._meta['collectors'] = [self.collectors.name(cid)
+                                    for cid in range(len(self.collectors))]
+        self._meta['chunks'].append({
+            'file': file,
+            'frames': len(self._frames),
+            't': [int(arrays['t'][0]), int(arrays['t'][-1])],
+            'kinds': kinds
+        })
+        self._frames = []
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(self._meta, f, default=str)
+
+    def close(self):
+        """ Write the remaining frames to disk. """
+        self._write_chunk()
+
+
+class Playback:
+    """ Replays a recording of a :class:`Control` without the model.
+    Can be passed to :class:`Control` in place of a simulation model,
+    with the same charts and variables as in the recorded control panel.
+    Steps advance by one recorded frame, and the replay speed can be set
+    with the parameter `fps`. Use :func:`Control.seek` to jump
+    to a time-step.
+
+    Arguments:
+        path (str): Directory of the recording, see :func:`Control.record`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self._meta = json.load(f)
+        self.p = _Parameters(self._meta['parameters'])
+        chunks = self._meta['chunks']
+        self._starts = np.cumsum([0] + [c['frames'] for c in chunks])
+        self.n_frames = int(self._starts[-1])
+        self.t_max = chunks[-1]['t'][1] if chunks else 0
+        self._chunk = None  # Index and data of the loaded chunk
+        self._mapping = None  # Collector ids -> recorded ids
+        self.frame = 0
+        self.t = 0
+        self.running = False
+
+    def set_parameters(self, parameters):
+        self.p.update(parameters)
+
+    def sim_setup(self):
+        self.seek_frame(0)
+
+    def sim_step(self):
+        self.seek_frame(min(self.frame + 1, self.n_frames - 1))
+
+    def seek(self, t):
+        """ Go to the last recorded frame with a time-step of at most `t`. """
+        chunks = self._meta['chunks']
+        i = 0
+        while i + 1 < len(chunks) and chunks[i + 1]['t'][0] <= t:
+            i += 1
+        ts = self._load(i)['t']
+        j = max(int(np.searchsorted(ts, t, side='right')) - 1, 0)
+        self.seek_frame(int(self._starts[i]) + j)
+
+    def seek_frame(self, frame):
+        """ Go to the recorded frame with index `frame`. """
+        self.frame = frame
+        self.running = frame < self.n_frames - 1
+        i, j = self._locate(frame)
+        self.t = int(self._load(i)['t'][j])
+
+    def collect(self, collectors):
+        """ Returns the recorded data of the current frame
+        as a dictionary of collector ids and data. """
+        if self._mapping is None or len(self._mapping) != len(collectors):
+            self._mapping = self._map(collectors)
+        i, j = self._locate(self.frame)
+        data = self._load(i)
+        kinds = self._meta['chunks'][i]['kinds']
+        values = {}
+        for cid, rid in self._mapping.items():
+            kind = kinds[str(rid)]
+            if kind == 'scalar':
+                values[cid] = data[f'c{rid}'][j].item()
+            elif kind == 'list':
+                values[cid] = data[f'c{rid}_{j}'].tolist()
+            else:
+                values[cid] = data[f'c{rid}_{j}']
+        return values
+
+    def _map(self, collectors):
+        """ Match collectors by name, and by order for equal names. """
+        recorded = collections.defaultdict(list)
+        for rid, name in enumerate(self._meta['collectors']):
+            recorded[name].append(rid)
+        seen = collections.Counter()
+        mapping = {}
+        for cid in range(len(collectors)):
+            name = collectors.name(cid)
+            if seen[name] >= len(recorded[name]):
+                raise KeyError(f"Collector '{name}' is not in the recording "
+                               f"'{self.path}'.")
+            mapping[cid] = recorded[name][seen[name]]
+            seen[name] += 1
+        return mapping
+
+    def _locate(self, frame):
+        i = int(np.searchsorted(self._starts, frame, side='right')) - 1
+        return i, frame - int(self._starts[i])
+
+    def _load(self, i):
+        """ Load chunk `i`, keeping only the most recent chunk in memory. """
+        if self._chunk is None or self._chunk[0] != i:
+            file = os.path.join(self.path, self._meta['chunks'][i]['file'])
+            with np.load(file, allow_pickle=True) as npz:
+                self._chunk = (i, dict(npz))
+        return self._chunk[1]
+
+
+class _Parameters(dict):
+    """ Parameters of a recording, also accessible as attributes. """
+
+    def __getattr__(self, k):
+        try:
+            return self[k]
+        except KeyError:
+            raise AttributeError(k)
@@ -0,0 +1,116 @@
+import time
+import collections
+
+
+class Timings:
+    """ Rolling window of the most recent durations of a phase.
+
+    Arguments:
+        size (int, optional): Number of durations to keep (default 1000).
+    """
+
+    def __init__(self, size=1000):
+        self.durations = collections.deque(maxlen=size)  # In seconds
+        self.total = 0  # Number of measurements since creation
+
+    def __repr__(self):
+        return (f"Timings of {len(self.durations)} calls: "
+                f"mean {self.mean:.3f} ms, p95 {self.percentile(95):.3f} ms, "
+                f"max {self.max:.3f} ms")
+
+    def add(self, seconds):
+        self.durations.append(seconds)
+        self.total += 1
+
+    @property
+    def mean(self):
+        """ Mean duration in milliseconds. """
+        if not self.durations:
+            return 0.
+        return 1e3 * sum(self.durations) / len(self.durations)
+
+    @property
+    def max(self):
+        """ Maximum duration in milliseconds. """
+        return 1e3 * max(self.durations) if self.durations else 0.
+
+    def percentile(self, q):
+        """ Percentile `q` of the durations in milliseconds. """
+        import numpy as np
+        if not self.durations:
+            return 0.
+        return 1e3 * float(np.percentile(self.durations, q))
+
+    def histogram(self, bins=20):
+        """ Histogram of the durations in milliseconds,
+        with logarithmically spaced bins.
+
+        Returns:
+            tuple of numpy.ndarray: Counts and bin edges.
+        """
+        import numpy as np
+        durations = 1e3 * np.array(self.durations)
+        if not len(durations):
+            return np.zeros(bins, dtype=int), np.zeros(bins + 1)
+        low = max(durations.min(), 1e-6)
+        high = max(durations.max(), low * 1.01)
+        edges = np.geomspace(low, high, bins + 1)
+        return np.histogram(durations, bins=edges)
+
+    def summary(self):
+        """ Dictionary of summary statistics in milliseconds. """
+        return {'count': self.total, 'mean': self.mean,
+                'p50': self.percentile(50), 'p95': self.percentile(95),
+                'max': self.max}
+
+
+class _Measurement:
+
+    __slots__ = ('timings', 'start')
+
+    def __init__(self, timings):
+        self.timings = timings
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.timings.add(time.perf_counter() - self.start)
+
+
+class _NoMeasurement:
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_no_measurement = _NoMeasurement()
+
+
+class Profiler:
+    """ Measures the time spent in the phases of a simulation,
+    e.g. `with profiler.measure('step'): model.sim_step()`.
+    Keys can be any hashable object. If disabled, measurements are skipped.
+
+    Arguments:
+        enabled (bool, optional): Whether to measure (default True).
+        size (int, optional): Window size of the :class:`Timings`.
+    """
+
+    def __init__(self, enabled=True, size=1000):
+        self.enabled = enabled
+        self.size = size
+        self.timings = {}
+
+    def measure(self, key):
+        """ Context manager that adds its duration to the timings of `key`. """
+        if not self.enabled:
+            return _no_measurement
+        try:
+            timings = self.timings[key]
+        except KeyError:
+            timings = self.timings[key] = Timings(self.size)
+        return _Measurement(timings)
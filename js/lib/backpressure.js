@@ -0,0 +1,28 @@
+// Acknowledgement of rendered messages, for backpressure in the kernel.
+// See Ipswidget._ready in charts.py for the kernel counterpart to this file.
+// Chart models count each received message with `received`, and their
+// views call `rendered` after drawing, which acknowledges all messages
+// that have been received since the last draw. Messages that are not drawn,
+// e.g. because the model has no views, are acknowledged right away.
+
+
+function received(model, drawn) {
+    model.unacked = (model.unacked || 0) + 1;
+    if (drawn === false || Object.keys(model.views).length === 0) {
+        rendered(model);
+    }
+}
+
+
+function rendered(model) {
+    if (model.unacked) {
+        model.send({event: 'ack', n: model.unacked});
+        model.unacked = 0;
+    }
+}
+
+
+module.exports = {
+    received: received,
+    rendered: rendered
+};
@@ -62,6 +62,11 @@ var ControlView = widgets.DOMWidgetView.extend({
         // alert(this.model.get(''))
     },
 
+    timeline_change: function(value) {
+        // Rewind to the chosen time-step once the slider is released
+        this.send({event: 'rewind', t: parseInt(value)});
+    },
+
     param_label_change: function(name, value, label) {
         // For updates after release
         label.textContent = value
@@ -69,20 +74,37 @@ var ControlView = widgets.DOMWidgetView.extend({
     },
 
     param_change: function(name, value) {
-        // For updates after release
+        // Collect changes and send only the latest value per parameter,
+        // at most once per parameter_delay milliseconds
+        this.new_parameters[name] = value
+        if (this.parameter_timer === null) {
+            this.parameter_timer = setTimeout(
+                () => this.send_parameters(), this.parameter_delay);
+        }
+    },
+
+    send_parameters: function() {
         this.send({
-            event: 'update_parameter',
-            k: name,
-            v: value,
+            event: 'update_parameters',
+            parameters: this.new_parameters,
         })
+        this.new_parameters = {}
+        this.parameter_timer = null
     },
 
     // Render control interface -------------------------------------------- //
     render: function() {
 
+        // Parameter changes that have not been sent yet
+        this.new_parameters = {}
+        this.parameter_timer = null
+        this.parameter_delay = 50
+
         // Handle traitlet changes
         this.model.on('change:is_running', this.is_running_changed, this);
         this.model.on('change:_variables', this.variables_changed, this);
+        this.listenTo(this.model, 'msg:custom', this.on_msg);
+        this.model.on('change:t change:_t_max', this.timeline_changed, this);
         
         // Control interface ----------------------------------------------- //
         this.control = document.createElement("div");
@@ -118,6 +140,35 @@ var ControlView = widgets.DOMWidgetView.extend({
         this.redo_button.addEventListener("click",
             (inputEvent => this.click_redo()), false);
 
+        // Timeline widget ------------------------------------------------- //
+        if (this.model.get('_timeline')) {
+            let row = document.createElement("div");
+            row.className = "row";
+            this.control.appendChild(row);
+
+            let label = document.createElement("span");
+            label.className = "plabel";
+            label.textContent = "t ";
+            row.appendChild(label);
+
+            this.timeline_label = document.createElement("span");
+            row.appendChild(this.timeline_label);
+
+            this.timeline = document.createElement("input");
+            this.timeline.className = "slider";
+            this.timeline.setAttribute('type', 'range');
+            this.timeline.setAttribute('step', 1);
+            this.timeline.setAttribute('min', 0);
+            this.timeline.setAttribute('title', 'Rewind simulation');
+            this.timeline.addEventListener("input",
+                inputEvent => this.timeline_label.textContent =
+                    this.timeline.value);
+            this.timeline.addEventListener("change",
+                inputEvent => this.timeline_change(this.timeline.value));
+            row.appendChild(this.timeline);
+            this.timeline_changed();
+        }
+
         // Variable widgets ------------------------------------------------ //
         this.var_displays = {}
         let variables = this.model.get('_variables');
@@ -206,6 +257,7 @@ var ControlView = widgets.DOMWidgetView.extend({
         }
 
         // Setup ----------------------------------------------------------- //
+        this.send({event: 'request_variables'});
         this.send({event: 'setup_simulation'});
     },
 
@@ -220,6 +272,21 @@ var ControlView = widgets.DOMWidgetView.extend({
         }
     },
 
+    on_msg: function(command, buffers) {
+        if (command.what === 'variables') {
+            this.patch_variables(command.values);
+        }
+    },
+
+    patch_variables: function(values) {
+        // Update the labels of variables whose text has changed
+        for (const [key, text] of Object.entries(values)) {
+            if (key in this.var_displays) {
+                this.var_displays[key].textContent = text;
+            }
+        }
+    },
+
     variables_changed: function() {
         let variables = this.model.get('_variables');
         for (const [key, value] of Object.entries(variables)) {
@@ -228,6 +295,15 @@ var ControlView = widgets.DOMWidgetView.extend({
         //this.output2.textContent = this.model.get('t');
     },
     
+    timeline_changed: function() {
+        if (this.timeline) {
+            let t = this.model.get('t');
+            this.timeline.setAttribute('max', this.model.get('_t_max'));
+            this.timeline.value = t;
+            this.timeline_label.textContent = t;
+        }
+    },
+
     reset_changed: function() {
         this.model.data = []
     }
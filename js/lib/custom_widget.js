@@ -1,6 +1,8 @@
 var widgets = require('@jupyter-widgets/base');
 var semver_range = require('../package.json').version;
 var d3 = require('d3');
+var encoding = require('./encoding.js');
+var backpressure = require('./backpressure.js');
 require('./charts.css');
 require('lodash');
 
@@ -33,28 +35,52 @@ var CustomWidgetModel = widgets.DOMWidgetModel.extend({
         if (command.what) {
             switch (command.what) {
                 case 'new_data':
-                    this.update_views(command.data);
+                    this.update_views(this._decode(command, buffers));
                     break;
                 case 'reset_data':
-                    this.reset_views(command.data);
+                    this.reset_views(this._decode(command, buffers));
                     break;
             }
         }
+        // Acknowledged by the views once the message has been drawn
+        backpressure.received(this);
     },
 
+	_decode: function(command, buffers) {
+		// Add arrays that have been sent as binary buffers to the data.
+		// Rows of two-dimensional arrays are views on a single array.
+		let data = command.data;
+		for (const [key, meta] of Object.entries(command.arrays || {})) {
+			let values = encoding.decode_array(meta, buffers[meta.buffer]);
+			if (meta.shape.length > 1) {
+				let columns = values.length / meta.shape[0];
+				values = Array.from({length: meta.shape[0]}, (_, i) =>
+					values.subarray(i * columns, (i + 1) * columns));
+			}
+			data[key] = values;
+		}
+		return data;
+	},
+
 	update_views: function(data) {
 		for (var key in this.views) {  // Send data to all views
 			this.views[key].then(this._update_view.bind(null, data))
 		}
 	},
-    _update_view: function(data, view) {view.update(data);},
+    _update_view: function(data, view) {
+		view.update(data);
+		backpressure.rendered(view.model);
+	},
 
 	reset_views: function() {
     	for (var key in this.views) {
 			this.views[key].then(this._reset_view.bind(null))
 		}
     },
-    _reset_view: function(view) {view.reset();},
+    _reset_view: function(view) {
+		view.reset();
+		backpressure.rendered(view.model);
+	},
 
 
 });
@@ -8,4 +8,6 @@
 module.exports = require('./control.js');
 module.exports = require('./line.js');
 module.exports = require('./scatter.js');
+module.exports = require('./grid.js');
+module.exports = require('./histogram.js');
 module.exports['version'] = require('../package.json').version;
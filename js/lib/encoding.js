@@ -0,0 +1,47 @@
+// Helpers to read binary buffers sent by the kernel.
+// See encoding.py for the kernel counterpart to this file.
+
+
+function typed_array(buffer, type) {
+    // Create a typed array view on a buffer received over the comm.
+    // Buffers arrive as DataViews on a shared ArrayBuffer, whose offset
+    // is not necessarily aligned to the element size of the typed array.
+    if (buffer instanceof ArrayBuffer) {
+        buffer = new DataView(buffer);
+    }
+    let offset = buffer.byteOffset;
+    let length = buffer.byteLength / type.BYTES_PER_ELEMENT;
+    if (offset % type.BYTES_PER_ELEMENT === 0) {
+        return new type(buffer.buffer, offset, length);
+    }
+    return new type(buffer.buffer.slice(offset, offset + buffer.byteLength));
+}
+
+
+function decode_array(meta, buffer) {
+    // Decode numbers that were encoded with reduced precision,
+    // as a flat Float32Array, or Float64Array for full precision.
+    // Quantized values are mapped back into the bounding box of their column.
+    if (meta.dtype === 'float32') {
+        return typed_array(buffer, Float32Array);
+    }
+    if (meta.dtype === 'float64') {
+        return typed_array(buffer, Float64Array);
+    }
+    let quantized = typed_array(buffer, Uint16Array);
+    let columns = meta.lo.length;
+    let scale = meta.lo.map((lo, j) => (meta.hi[j] - lo) / 65534);
+    let values = new Float32Array(quantized.length);
+    for (let i = 0; i < quantized.length; i++) {
+        let j = i % columns;
+        let q = quantized[i];
+        values[i] = q === 65535 ? NaN : meta.lo[j] + q * scale[j];
+    }
+    return values;
+}
+
+
+module.exports = {
+    typed_array: typed_array,
+    decode_array: decode_array,
+};
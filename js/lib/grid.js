@@ -0,0 +1,211 @@
+var widgets = require('@jupyter-widgets/base');
+var semver_range = require('../package.json').version;
+var d3 = require('d3');
+var encoding = require('./encoding.js');
+var backpressure = require('./backpressure.js');
+require('./charts.css');
+require('lodash');
+
+
+var GridModel = widgets.DOMWidgetModel.extend({
+
+    defaults: _.extend(widgets.DOMWidgetModel.prototype.defaults(), {
+        _model_name : 'GridModel',
+        _view_name : 'GridView',
+        _model_module : 'ipysimulate',
+        _view_module : 'ipysimulate',
+        _model_module_version : semver_range,
+        _view_module_version : semver_range,
+    }),
+
+	initialize: function (attributes, options) {
+        widgets.DOMWidgetModel.prototype
+			.initialize.call(this, attributes, options);
+		this.on('msg:custom', this._on_msg.bind(this));
+		this.values = null  // Current grid as a flat typed array
+		this.shape = [0, 0]
+		this.vmin = 0
+		this.vmax = 1
+
+		// Delta frames are only applied after a full frame, which is
+		// requested in case the grid was sent before this model was created,
+		// e.g. before a page reload
+		this.synced = false
+		this.send({event: 'request_keyframe'});
+    },
+
+	_on_msg: function (command, buffers) {
+        let drawn = true;
+        if (command.what) {
+            switch (command.what) {
+                case 'frame':
+                    if (command.encoding === 'delta' && !this.synced) {
+                        drawn = false;
+                        break;
+                    }
+                    this.apply_frame(command, buffers);
+                    this.update_views();
+                    this.synced = true;
+                    break;
+                case 'reset_data':
+                    this.values = null;
+                    this.update_views();
+                    break;
+            }
+        }
+        // Acknowledged by the views once the message has been drawn
+        backpressure.received(this, drawn);
+    },
+
+	apply_frame: function(command, buffers) {
+		// Update the grid with a full, run-length encoded, or delta frame
+		let type = command.dtype === 'uint8' ? Uint8Array : Float32Array;
+		let size = command.shape[0] * command.shape[1];
+		if (this.values === null || !(this.values instanceof type)
+				|| this.values.length !== size) {
+			this.values = new type(size);
+		}
+		let values = this.values;
+		switch (command.encoding) {
+			case 'raw':
+				values.set(encoding.typed_array(buffers[0], type));
+				break;
+			case 'rle':
+				let runs = encoding.typed_array(buffers[0], type);
+				let lengths = encoding.typed_array(buffers[1], Int32Array);
+				let start = 0;
+				for (let i = 0; i < runs.length; i++) {
+					values.fill(runs[i], start, start + lengths[i]);
+					start += lengths[i];
+				}
+				break;
+			case 'delta':
+				let indices = encoding.typed_array(buffers[0], Int32Array);
+				let changes = encoding.typed_array(buffers[1], type);
+				for (let i = 0; i < indices.length; i++) {
+					values[indices[i]] = changes[i];
+				}
+				break;
+		}
+		this.shape = command.shape;
+		this.vmin = command.vmin;
+		this.vmax = command.vmax;
+	},
+
+	update_views: function() {
+		for (var key in this.views) {
+			this.views[key].then(view => view.update())
+		}
+	},
+
+});
+
+
+function color_lut(cmap) {
+	// Colors as RGBA packed into 32-bit integers, in the byte order
+	// of ImageData. A list of colors is used as is, while a scheme name
+	// is sampled into 256 colors.
+	let colors;
+	if (Array.isArray(cmap)) {
+		colors = cmap;
+	} else {
+		let name = Object.keys(d3).find(key => key.toLowerCase()
+			=== 'interpolate' + cmap.toLowerCase());
+		let interpolate = d3[name || 'interpolateViridis'];
+		colors = d3.range(256).map(i => interpolate(i / 255));
+	}
+	let lut = new Uint32Array(colors.length);
+	let bytes = new Uint8Array(lut.buffer);
+	for (let i = 0; i < colors.length; i++) {
+		let c = d3.rgb(colors[i]);
+		bytes.set([c.r, c.g, c.b, Math.round(c.opacity * 255)], 4 * i);
+	}
+	return lut;
+}
+
+
+var GridView = widgets.DOMWidgetView.extend({
+
+    // Render view --------------------------------------------------------- //
+    render: function() {
+
+        this.container = document.createElement("div");
+        this.container.className = 'ipysimulate-chart'
+        this.el.appendChild(this.container);
+
+		// One canvas pixel per cell, scaled without smoothing
+		this.canvas = document.createElement("canvas");
+		this.canvas.setAttribute("style",
+			"width: 100%; image-rendering: pixelated; display: block");
+		this.container.appendChild(this.canvas);
+		this.context = this.canvas.getContext("2d");
+		this.image = null;  // Reused between frames
+
+		this.model.on('change:cmap', this.cmap_changed, this);
+		this.cmap_changed();
+		this.frame = null;  // Scheduled animation frame
+		this.update();
+	},
+
+	cmap_changed: function() {
+		let cmap = this.model.get('cmap');
+		this.categorical = Array.isArray(cmap);
+		this.lut = color_lut(cmap);
+		this.update();
+	},
+
+	update: function() {
+		// Draw at most once per animation frame
+		if (this.frame === null) {
+			this.frame = requestAnimationFrame(() => {
+				this.frame = null;
+				this.draw();
+				backpressure.rendered(this.model);
+			});
+		}
+	},
+
+	draw: function() {
+		let model = this.model;
+		let values = model.values;
+		if (values === null) {
+			this.context.clearRect(0, 0, this.canvas.width, this.canvas.height);
+			return;
+		}
+		let [height, width] = model.shape;
+		if (this.image === null || this.image.width !== width
+				|| this.image.height !== height) {
+			this.canvas.width = width;
+			this.canvas.height = height;
+			this.image = this.context.createImageData(width, height);
+			this.pixels = new Uint32Array(this.image.data.buffer);
+		}
+
+		// Map values to colors through the lookup table
+		let pixels = this.pixels;
+		let lut = this.lut;
+		let last = lut.length - 1;
+		if (this.categorical) {
+			for (let i = 0; i < values.length; i++) {
+				let k = values[i];
+				pixels[i] = k >= 0 && k <= last ? lut[k | 0] : 0;
+			}
+		} else {
+			let vmin = model.vmin;
+			let scale = model.vmax > vmin ? last / (model.vmax - vmin) : 0;
+			for (let i = 0; i < values.length; i++) {
+				let k = (values[i] - vmin) * scale;
+				// NaN is transparent
+				pixels[i] = k === k ? lut[k < 0 ? 0 : k > last ? last
+					: Math.round(k)] : 0;
+			}
+		}
+		this.context.putImageData(this.image, 0, 0);
+	},
+
+});
+
+module.exports = {
+    GridModel: GridModel,
+    GridView: GridView,
+};
@@ -0,0 +1,168 @@
+var widgets = require('@jupyter-widgets/base');
+var semver_range = require('../package.json').version;
+var d3 = require('d3');
+var backpressure = require('./backpressure.js');
+require('./charts.css');
+require('lodash');
+
+
+var HistogramModel = widgets.DOMWidgetModel.extend({
+
+    defaults: _.extend(widgets.DOMWidgetModel.prototype.defaults(), {
+        _model_name : 'HistogramModel',
+        _view_name : 'HistogramView',
+        _model_module : 'ipysimulate',
+        _view_module : 'ipysimulate',
+        _model_module_version : semver_range,
+        _view_module_version : semver_range,
+    }),
+
+	initialize: function (attributes, options) {
+        widgets.DOMWidgetModel.prototype
+			.initialize.call(this, attributes, options);
+		this.on('msg:custom', this._on_msg.bind(this));
+		this.data = null  // Latest bin edges, counts, and quantiles
+    },
+
+	_on_msg: function (command, buffers) {
+        if (command.what) {
+            switch (command.what) {
+                case 'new_data':
+                    this.data = command;
+                    this.update_views();
+                    break;
+                case 'reset_data':
+                    this.data = null;
+                    this.update_views();
+                    break;
+            }
+        }
+        // Acknowledged by the views once the message has been drawn
+        backpressure.received(this);
+    },
+
+	update_views: function() {
+		for (var key in this.views) {
+			this.views[key].then(view => view.update())
+		}
+	},
+
+});
+
+
+var HistogramView = widgets.DOMWidgetView.extend({
+
+    // Render view --------------------------------------------------------- //
+    render: function() {
+
+        this.container = document.createElement("div");
+        this.container.className = 'ipysimulate-chart'
+        this.el.appendChild(this.container);
+
+		var width = 500;
+		var height = 300;
+		var margin = {top: 20, right: 30, bottom: 40, left: 40}
+
+		this.svg = d3.select(this.container).append("svg")
+			.attr("style", "width: 100%; height: 100%")
+			.attr("viewBox", [0, 0, width, height])
+			.append("g");
+
+		this.x = d3.scaleLinear().range([margin.left, width - margin.right]);
+		this.y = d3.scaleLinear().range([height - margin.bottom, margin.top]);
+
+		// Axis ------------------------------------------------------------ //
+
+		this.xAxis = d3.axisBottom().scale(this.x);
+		this.yAxis = d3.axisLeft().scale(this.y);
+		this.svg.append("g")
+		  .attr("transform", `translate(0,${height - margin.bottom})`)
+		  .attr("class", "myXaxis")
+		this.svg.append("g")
+		  .attr("transform", `translate(${margin.left},0)`)
+		  .attr("class", "myYaxis")
+
+		this.svg.append("text")
+		    .attr("class", "chart-label")
+		    .attr("text-anchor", "middle")
+		    .attr("x", margin.left + (width - margin.right - margin.left)/2 )
+		    .attr("y", height - 5)
+		    .text(this.model.get('xlabel'));
+
+		// Content --------------------------------------------------------- //
+
+		this.bars = this.svg.append("g")
+			.attr("fill", d3.schemeSet2[0]);
+		this.lines = this.svg.append("g")
+			.attr("stroke", "#555")
+			.attr("stroke-dasharray", "4 2");
+		this.labels = this.svg.append("g")
+			.attr("class", "chart-label")
+			.attr("text-anchor", "middle");
+		this.top = margin.top;
+		this.bottom = height - margin.bottom;
+
+		this.frame = null;  // Scheduled animation frame
+		this.update();
+	},
+
+	update: function() {
+		// Draw at most once per animation frame
+		if (this.frame === null) {
+			this.frame = requestAnimationFrame(() => {
+				this.frame = null;
+				this.draw();
+				backpressure.rendered(this.model);
+			});
+		}
+	},
+
+	draw: function() {
+		var data = this.model.data;
+		var edges = data ? data.edges : [];
+		var counts = data ? data.counts : [];
+		var quantiles = data && data.quantiles ? data.quantiles : [];
+		var x = this.x;
+		var y = this.y;
+
+		if (data) {
+			x.domain([edges[0], edges[edges.length - 1]]);
+			y.domain([0, d3.max(counts) || 1]);
+			this.svg.selectAll(".myXaxis").call(this.xAxis);
+			this.svg.selectAll(".myYaxis").call(this.yAxis);
+		}
+
+		this.bars
+			.selectAll("rect")
+			.data(counts)
+			.join("rect")
+			  .attr("x", (d, i) => x(edges[i]) + 0.5)
+			  .attr("width", (d, i) =>
+				  Math.max(x(edges[i + 1]) - x(edges[i]) - 1, 0))
+			  .attr("y", d => y(d))
+			  .attr("height", d => y(0) - y(d));
+
+		this.lines
+			.selectAll("line")
+			.data(quantiles)
+			.join("line")
+			  .attr("x1", d => x(d[1]))
+			  .attr("x2", d => x(d[1]))
+			  .attr("y1", this.top)
+			  .attr("y2", this.bottom);
+
+		this.labels
+			.selectAll("text")
+			.data(quantiles)
+			.join("text")
+			  .attr("x", d => x(d[1]))
+			  .attr("y", this.top - 5)
+			  .text(d => `q${d[0]}`);
+	},
+
+});
+
+module.exports = {
+    HistogramModel: HistogramModel,
+    HistogramView: HistogramView,
+};
@@ -3,12 +3,18 @@ var control = require('./control.js');
 var line = require('./line.js');
 var scatter = require('./scatter.js');
 var custom_widget = require('./custom_widget.js');
+var grid = require('./grid.js');
+var histogram = require('./histogram.js');
 
 module.exports = {
     ControlModel: control.ControlModel,
     ControlView: control.ControlView,
     CustomWidgetModel: custom_widget.CustomWidgetModel,
     CustomWidgetView: custom_widget.CustomWidgetView,
+    GridModel: grid.GridModel,
+    GridView: grid.GridView,
+    HistogramModel: histogram.HistogramModel,
+    HistogramView: histogram.HistogramView,
     LinechartModel: line.LinechartModel,
     LinechartView: line.LinechartView,
     ScatterModel: scatter.ScatterModel,
@@ -1,10 +1,33 @@
 var widgets = require('@jupyter-widgets/base');
 var semver_range = require('../package.json').version;
 var d3 = require('d3');
+var encoding = require('./encoding.js');
+var backpressure = require('./backpressure.js');
 require('./charts.css');
 require('lodash');
 
 
+function append(array, values, extent) {
+	// Append values in place (push(...values) fails for large blocks),
+	// and widen the extent [min, max] to include all finite values
+	for (let i = 0; i < values.length; i++) {
+		let value = values[i]
+		array.push(value)
+		if (Number.isFinite(value)) {
+			if (value < extent[0]) extent[0] = value
+			if (value > extent[1]) extent[1] = value
+		}
+	}
+}
+
+
+function domain(extent) {
+	// Scale domain of an extent, with some space around a single value
+	if (extent[0] < extent[1]) return extent.slice()
+	return [extent[0] - 0.5, extent[0] + 0.5]
+}
+
+
 var LinechartModel = widgets.DOMWidgetModel.extend({
 
     defaults: _.extend(widgets.DOMWidgetModel.prototype.defaults(), {
@@ -25,28 +48,63 @@ var LinechartModel = widgets.DOMWidgetModel.extend({
 		this.xlabel = this.get('xlabel');
 		this.ylabels = this.get('ylabels');
 		this.reset_data()
+
+		// Points that were sent before this model was created,
+		// e.g. before a page reload, are kept in the kernel
+		this.send({event: 'request_history'});
     },
 
 	_on_msg: function (command, buffers) {
         if (command.what) {
             switch (command.what) {
                 case 'new_data':
-                    this.update(command.data);
+                    this.update(command.arrays
+                        ? this._decode(command.arrays, buffers)
+                        : command.data);
+                    break;
+                case 'history':
+                    // Replace all points with the kernel's history
+                    this.reset_data();
+                    this.update(this._decode(command.arrays, buffers));
                     break;
                 case 'reset_data':
                     this.reset();
                     break;
             }
         }
+        // Acknowledged by the views once the message has been drawn
+        backpressure.received(this);
     },
 
+	_decode: function(arrays, buffers) {
+		// Points that have been sent as binary buffers
+		let decode = meta => encoding.decode_array(meta, buffers[meta.buffer])
+		let series = {}
+		for (const [key, meta] of Object.entries(arrays.series)) {
+			series[key] = decode(meta)
+		}
+		let data = {'x': decode(arrays.x), 'series': series}
+		if (arrays.bands) {
+			data.bands = {}
+			for (const [key, meta] of Object.entries(arrays.bands)) {
+				data.bands[key] = {'lo': decode(meta.lo), 'hi': decode(meta.hi)}
+			}
+		}
+		return data
+	},
+
 	update: function(new_data) {
-		// Append new data
-		this.data.x.push(new_data.x)
-		for (const [key, value] of Object.entries(new_data.series)) {
-			this.series[key].push(value)
+		// Append a block of new data points
+		append(this.data.x, new_data.x, this.xextent)
+		for (const [key, values] of Object.entries(new_data.series)) {
+			append(this.series[key].values, values, this.yextent)
+		}
+		// Quantile bands of an ensemble of replicates
+		for (const [key, band] of Object.entries(new_data.bands || {})) {
+			append(this.series[key].lo, band.lo, this.yextent)
+			append(this.series[key].hi, band.hi, this.yextent)
 		}
-		// Send updated data to all views
+		// Send updated data to all views (once per block)
 		this.update_views()
 	},
 
@@ -66,14 +124,17 @@ var LinechartModel = widgets.DOMWidgetModel.extend({
 	},
 
 	reset_data: function () {
+		this.generation = (this.generation || 0) + 1  // Views redraw all
+		this.xextent = [Infinity, -Infinity]
+		this.yextent = [Infinity, -Infinity]
 		this.data = {'x': [], 'series': []};
 		this.series = {}
 		var i;
 		for (i = 0; i < this.ylabels.length; i++) {
 			let label = this.ylabels[i]
-			let series_entry = {'name': label, 'values': []}
+			let series_entry = {'name': label, 'values': [], 'lo': [], 'hi': []}
 			this.data.series.push(series_entry)
-			this.series[label] = series_entry.values
+			this.series[label] = series_entry
 		}
 	},
 
@@ -130,16 +191,29 @@ var LinechartView = widgets.DOMWidgetView.extend({
 		  .domain(d3.range(0, this.model.data.series.length, 1))
 		  .range(d3.schemeSet2);
 
-		// Path collection (g)
+		// Path collection (g), drawn in data coordinates and
+		// positioned with a transform, so that rescaling is cheap
 		var paths = svg.append("g")
 	      .attr("fill", "none")
 	      .attr("stroke-width", 1.5)
 
-		// Path objects
-	    paths.selectAll("path")
+		// Band groups below the lines, one per series
+		this.bands_groups = paths.append("g")
+		  .attr("stroke", "none")
+		  .attr("fill-opacity", 0.25)
+		  .selectAll("g")
 		    .data(this.model.data.series)
-		    .join("path")
+		    .join("g")
+		    .attr("fill", (d, i) => color(i))
+		    .nodes()
+
+		// Path groups, one per series
+	    this.lines_groups = paths.append("g")
+		  .selectAll("g")
+		    .data(this.model.data.series)
+		    .join("g")
 		    .attr("stroke", (d, i) => color(i))
+		    .nodes()
 
 
 		// Legend --------------------------------------------------------- //
@@ -173,44 +247,163 @@ var LinechartView = widgets.DOMWidgetView.extend({
 		this.y = y
 		this.xAxis = xAxis
 		this.yAxis = yAxis
+		this.chunk_size = 1000  // Points per path element
+		this.frame = null  // Scheduled animation frame
+		this.reset_view()
 
 	},
 
+	reset_view: function () {
+		// Remove all drawn points
+		for (const group of this.lines_groups) {
+			group.textContent = ''
+		}
+		for (const group of this.bands_groups) {
+			group.textContent = ''
+		}
+		this.lines = this.lines_groups.map(group => (
+			{group: group, node: null, d: '', points: 0, last: null}))
+		this.bands = this.bands_groups.map(group => (
+			{group: group, node: null, d: '', points: 0, last: null}))
+		this.drawn = 0  // Number of points that have been drawn
+		this.domains = null
+		this.generation = this.model.generation
+	},
+
 	update: function (data) {
+		// Draw at most once per animation frame
+		if (this.frame === null) {
+			this.frame = requestAnimationFrame(() => {
+				this.frame = null
+				this.draw()
+				backpressure.rendered(this.model)
+			})
+		}
+	},
+
+	draw: function () {
+		var model = this.model
+		if (model.generation !== this.generation) {
+			this.reset_view()
+		}
+		var data = model.data
+		var n = data.x.length
+		if (n > this.drawn) {
+			for (let k = 0; k < this.lines.length; k++) {
+				let series = data.series[k]
+				this.append_points(this.lines[k], data.x,
+								   series.values, this.drawn, n)
+				if (series.lo.length >= n) {
+					this.append_band(this.bands[k], data.x,
+									 series.lo, series.hi, this.drawn, n)
+				}
+			}
+			this.drawn = n
+		}
+		this.rescale(model.xextent, model.yextent)
+	},
 
-    	// Create a update selection: bind to the new data
-		var x = this.x
-		var y = this.y
-
-		// Line function TODO Move out of update
-    	var line = d3.line()
-			//.defined(d => !isNaN(d)) // TODO What does this do?
-			.x((d, i) => x(data.x[i]))
-			.y(d => y(d))
-
-		// Update scale
-		// TODO Update by comparing only new value
-		x.domain(d3.extent(data.x));
-		y.domain([d3.min(data.series, d => d3.min(d.values)),
-				  d3.max(data.series, d => d3.max(d.values)) ]);
-
-		// Update paths
-		this.paths
-			.selectAll("path")
-		    .data(data.series)
-			.attr("d", d => line(d.values));
-
-		// Update axis
-		this.svg.selectAll(".myXaxis")
-			.transition()
-			.duration(100)
-			.call(this.xAxis);
-		this.svg.selectAll(".myYaxis")
-			.transition()
-			.duration(100)
-			.call(this.yAxis);
-
-		},
+	append_points: function (line, xs, ys, start, end) {
+		// Append points to the latest path element of a series.
+		// Paths are split into elements of chunk_size points,
+		// so that earlier parts of a line are never rewritten.
+		for (let i = start; i < end; i++) {
+			let xv = xs[i]
+			let yv = ys[i]
+			if (!Number.isFinite(xv) || !Number.isFinite(yv)) {
+				line.last = null  // Gap in the line
+				continue
+			}
+			if (line.node === null || line.points >= this.chunk_size) {
+				if (line.node !== null) {
+					line.node.setAttribute("d", line.d)
+				}
+				line.node = document.createElementNS(
+					"http://www.w3.org/2000/svg", "path")
+				line.node.setAttribute("vector-effect", "non-scaling-stroke")
+				line.group.appendChild(line.node)
+				line.d = line.last === null ? '' : 'M' + line.last
+				line.points = 0
+			}
+			let point = xv + ',' + yv
+			line.d += (line.last === null ? 'M' : 'L') + point
+			line.last = point
+			line.points++
+		}
+		if (line.node !== null) {
+			line.node.setAttribute("d", line.d)
+		}
+	},
+
+	_path_node: function (path) {
+		// Start a new path element once the current one has chunk_size
+		// segments, so that earlier parts are never rewritten
+		if (path.node === null || path.points >= this.chunk_size) {
+			if (path.node !== null) {
+				path.node.setAttribute("d", path.d)
+			}
+			path.node = document.createElementNS(
+				"http://www.w3.org/2000/svg", "path")
+			path.group.appendChild(path.node)
+			path.d = ''
+			path.points = 0
+			return true
+		}
+		return false
+	},
+
+	append_band: function (band, xs, los, his, start, end) {
+		// Append one quad per segment between the lower and upper
+		// quantiles, so that a growing band never rewrites its path
+		for (let i = start; i < end; i++) {
+			let xv = xs[i]
+			let lo = los[i]
+			let hi = his[i]
+			if (!Number.isFinite(xv) || !Number.isFinite(lo)
+					|| !Number.isFinite(hi)) {
+				band.last = null  // Gap in the band
+				continue
+			}
+			if (band.last !== null) {
+				this._path_node(band)
+				let [x0, lo0, hi0] = band.last
+				band.d += `M${x0},${lo0}L${xv},${lo}L${xv},${hi}L${x0},${hi0}Z`
+				band.points++
+			}
+			band.last = [xv, lo, hi]
+		}
+		if (band.node !== null) {
+			band.node.setAttribute("d", band.d)
+		}
+	},
+
+	rescale: function (xextent, yextent) {
+		// Update scales, path transform, and axes if the extents changed
+		if (xextent[0] > xextent[1] || yextent[0] > yextent[1]) {
+			return  // No data
+		}
+		var xdomain = domain(xextent)
+		var ydomain = domain(yextent)
+		var domains = xdomain.concat(ydomain)
+		if (this.domains !== null
+				&& domains.every((v, i) => v === this.domains[i])) {
+			return
+		}
+		this.domains = domains
+
+		var x = this.x.domain(xdomain)
+		var y = this.y.domain(ydomain)
+		var [px0, px1] = x.range()
+		var [py0, py1] = y.range()
+		var ax = (px1 - px0) / (xdomain[1] - xdomain[0])
+		var ay = (py1 - py0) / (ydomain[1] - ydomain[0])
+		this.paths.attr("transform",
+			`translate(${px0 - ax * xdomain[0]},${py0 - ay * ydomain[0]}) `
+			+ `scale(${ax},${ay})`)
+
+		this.svg.selectAll(".myXaxis").call(this.xAxis)
+		this.svg.selectAll(".myYaxis").call(this.yAxis)
+	},
 
 });
 
@@ -1,6 +1,8 @@
 var widgets = require('@jupyter-widgets/base');
 var semver_range = require('../package.json').version;
 var d3 = require('d3');
+var encoding = require('./encoding.js');
+var backpressure = require('./backpressure.js');
 require('./charts.css');
 require('lodash');
 
@@ -21,21 +23,139 @@ var ScatterModel = widgets.DOMWidgetModel.extend({
 			.initialize.call(this, attributes, options);
 		this.on('msg:custom', this._on_msg.bind(this));
 		this.initial = true  // Trigger initial_update in view
+		this.clear_state()
+
+		// Delta updates are only applied after a keyframe, which is
+		// requested in case points were sent before this model was created,
+		// e.g. before a page reload
+		this.synced = false;
+		this.send({event: 'request_keyframe'});
     },
 
+	clear_state: function() {
+		// Points of delta updates, stored in slots of typed arrays
+		this.n = 0;
+		this.ids = new Int32Array(0);
+		this.xy = new Float32Array(0);
+		this.codes = new Int32Array(0);
+		this.slots = new Map();  // Id -> slot
+		this.colors = [];
+	},
+
 	_on_msg: function (command, buffers) {
+        let drawn = true;
         if (command.what) {
             switch (command.what) {
                 case 'new_data':
-                    this.update(command.data);
+                    this.update(this._read_frame(command, buffers));
+                    break;
+                case 'keyframe':
+                    this.clear_state();
+                    this.apply_changes(command, buffers);
+                    this.update(this._state_frame());
+                    this.synced = true;
+                    break;
+                case 'delta':
+                    if (!this.synced) {
+                        drawn = false;
+                        break;
+                    }
+                    this.apply_removals(
+						encoding.typed_array(buffers[3], Int32Array));
+                    this.apply_changes(command, buffers);
+                    this.update(this._state_frame());
                     break;
                 case 'reset_data':
-                    this.reset(command.data);
+                    this.reset();  // Drawn with the next frame
+                    drawn = false;
                     break;
             }
         }
+        // Acknowledged by the views once the message has been drawn
+        backpressure.received(this, drawn);
     },
 
+	_read_frame: function(command, buffers) {
+		// Coordinates are interleaved as [x0, y0, x1, y1, ...]
+		return {
+			n: command.n,
+			colors: command.colors,
+			xy: encoding.decode_array(command.xy, buffers[command.xy.buffer]),
+			codes: encoding.typed_array(buffers[1], Int32Array)
+		};
+	},
+
+	_state_frame: function() {
+		return {
+			n: this.n,
+			colors: this.colors,
+			xy: this.xy.subarray(0, 2 * this.n),
+			codes: this.codes.subarray(0, this.n)
+		};
+	},
+
+	_reserve: function(n) {
+		// Grow the state arrays to hold at least n points
+		if (this.ids.length >= n) {
+			return;
+		}
+		let size = Math.max(n, 2 * this.ids.length);
+		let ids = new Int32Array(size);
+		let xy = new Float32Array(2 * size);
+		let codes = new Int32Array(size);
+		ids.set(this.ids);
+		xy.set(this.xy);
+		codes.set(this.codes);
+		this.ids = ids;
+		this.xy = xy;
+		this.codes = codes;
+	},
+
+	apply_changes: function(command, buffers) {
+		// Update changed points and add new ones
+		if (command.colors) {  // Full table of a keyframe
+			this.colors = command.colors;
+		}
+		if (command.new_colors) {  // Colors added since the last update
+			this.colors = this.colors.concat(command.new_colors);
+		}
+		let ids = encoding.typed_array(buffers[0], Int32Array);
+		let xy = encoding.decode_array(command.xy, buffers[command.xy.buffer]);
+		let codes = encoding.typed_array(buffers[2], Int32Array);
+		this._reserve(this.n + command.n);
+		for (let i = 0; i < command.n; i++) {
+			let slot = this.slots.get(ids[i]);
+			if (slot === undefined) {
+				slot = this.n++;
+				this.slots.set(ids[i], slot);
+				this.ids[slot] = ids[i];
+			}
+			this.xy[2 * slot] = xy[2 * i];
+			this.xy[2 * slot + 1] = xy[2 * i + 1];
+			this.codes[slot] = codes[i];
+		}
+	},
+
+	apply_removals: function(ids) {
+		// Remove points by moving the last point into their slot
+		for (let i = 0; i < ids.length; i++) {
+			let slot = this.slots.get(ids[i]);
+			if (slot === undefined) {
+				continue;
+			}
+			let last = --this.n;
+			this.slots.delete(ids[i]);
+			if (slot !== last) {
+				let id = this.ids[last];
+				this.ids[slot] = id;
+				this.xy[2 * slot] = this.xy[2 * last];
+				this.xy[2 * slot + 1] = this.xy[2 * last + 1];
+				this.codes[slot] = this.codes[last];
+				this.slots.set(id, slot);
+			}
+		}
+	},
+
 	update: function(data) {
     	// Send data to all views
 		for (var key in this.views) {
@@ -43,12 +163,15 @@ var ScatterModel = widgets.DOMWidgetModel.extend({
 		}
 	},
 
-	reset: function(data) {
-    	this.initial = true;  // Trigger initial_update in view
-    	this.update(data);
+	reset: function() {
+		this.clear_state();
+    	this.initial = true;  // Trigger initial_update with next frame
     },
 
-	_update_view: function(data, view) {view.update(data);},
+	_update_view: function(data, view) {
+		view.update(data);
+		backpressure.rendered(view.model);
+	},
 
 });
 
@@ -93,19 +216,41 @@ var ScatterView = widgets.DOMWidgetView.extend({
 
 		// Content --------------------------------------------------------- //
 
-		// Dot collection (g)
+		// Dot collection (g), used by the svg renderer
 		this.dots = this.svg.append("g")
 
+		// Canvas, used by the canvas renderer for large numbers of dots.
+		// Drawn at the device resolution within the svg coordinates.
+		var scale = window.devicePixelRatio || 1;
+		this.canvas = this.svg.append("foreignObject")
+			.attr("width", width)
+			.attr("height", height)
+			.append("xhtml:canvas")
+			.attr("width", width * scale)
+			.attr("height", height * scale)
+			.attr("style", `width: ${width}px; height: ${height}px`)
+			.node();
+		this.context = this.canvas.getContext("2d");
+		this.context.scale(scale, scale);
+		this.width = width;
+		this.height = height;
+		this.use_canvas = false;
+		this.pixels = new Float32Array(0);  // Reused between frames
+		this.order = new Int32Array(0);  // Point indices grouped by color
+
 	},
 
 	initial_update: function(data) {
 
 		// Update scale (extra space to keep dots within)
-		this.x.domain(d3.extent(data, d => d.x));
-		this.y.domain(d3.extent(data, d => d.y));
+		var xy = data.xy;
+		var xs = d3.range(data.n).map(i => xy[2 * i]);
+		var ys = d3.range(data.n).map(i => xy[2 * i + 1]);
+		this.x.domain(d3.extent(xs));
+		this.y.domain(d3.extent(ys));
 
 		// Set up colormap
-		this.color = d3.scaleOrdinal(data.map(d => d.c), d3.schemeCategory10);
+		this.color = d3.scaleOrdinal(data.colors, d3.schemeCategory10);
 
 		// Update axis
 		this.svg.selectAll(".myXaxis")
@@ -126,29 +271,106 @@ var ScatterView = widgets.DOMWidgetView.extend({
     		this.initial_update(data)
 		}
 
-    	// Create an update selection: bind to the new data
+		let renderer = this.model.get('renderer');
+		let use_canvas = renderer === 'canvas' || (renderer === 'auto'
+			&& data.n > this.model.get('canvas_threshold'));
+		if (use_canvas !== this.use_canvas) {  // Clear other renderer
+			if (use_canvas) {
+				this.dots.selectAll("circle").remove();
+			} else {
+				this.context.clearRect(0, 0, this.width, this.height);
+			}
+			this.use_canvas = use_canvas;
+		}
+		if (use_canvas) {
+			this.draw_canvas(data);
+		} else {
+			this.draw_svg(data);
+		}
+	},
+
+	draw_canvas: function (data) {
+
+		// Scale coordinates into a reused buffer
+		var n = data.n;
+		var xy = data.xy;
+		if (this.pixels.length < 2 * n) {
+			this.pixels = new Float32Array(4 * n);
+		}
+		var pixels = this.pixels;
+		var x = this.x;
+		var y = this.y;
+		var [x0, x1] = x.domain(), [px0, px1] = x.range();
+		var [y0, y1] = y.domain(), [py0, py1] = y.range();
+		var ax = x1 !== x0 ? (px1 - px0) / (x1 - x0) : 0;
+		var ay = y1 !== y0 ? (py1 - py0) / (y1 - y0) : 0;
+		for (let i = 0; i < n; i++) {
+			pixels[2 * i] = px0 + ax * (xy[2 * i] - x0);
+			pixels[2 * i + 1] = py0 + ay * (xy[2 * i + 1] - y0);
+		}
+
+		// Group the points by color code with a counting sort,
+		// so that each frame takes O(n + colors) instead of O(n * colors)
+		var codes = data.codes;
+		var colors = data.colors.length;
+		var starts = new Int32Array(colors + 1);
+		for (let i = 0; i < n; i++) {
+			let k = codes[i];
+			if (k >= 0 && k < colors) starts[k + 1]++;
+		}
+		for (let k = 0; k < colors; k++) {
+			starts[k + 1] += starts[k];
+		}
+		if (this.order.length < n) {
+			this.order = new Int32Array(2 * n);
+		}
+		var order = this.order;
+		var next = starts.slice(0, colors);
+		for (let i = 0; i < n; i++) {
+			let k = codes[i];
+			if (k >= 0 && k < colors) order[next[k]++] = i;
+		}
+
+		// Draw one path per color that is in use
+		var context = this.context;
+		var r = this.r;
+		context.clearRect(0, 0, this.width, this.height);
+		for (let k = 0; k < colors; k++) {
+			if (starts[k] === starts[k + 1]) continue;
+			context.fillStyle = this.color(data.colors[k]);
+			context.beginPath();
+			for (let j = starts[k]; j < starts[k + 1]; j++) {
+				let i = order[j];
+				let px = pixels[2 * i], py = pixels[2 * i + 1];
+				context.moveTo(px + r, py);
+				context.arc(px, py, r, 0, 2 * Math.PI);
+			}
+			context.fill();
+		}
+	},
+
+	draw_svg: function (data) {
+
+    	// Create an update selection: bind point indices to the new data
 		var x = this.x
 		var y = this.y
 		var r = this.r
 		var color = this.color
-
-		// Clear dots
-		this.svg
-			.selectAll("circle")
-			.remove()
+		var xy = data.xy
+		var codes = data.codes
+		var colors = data.colors
 
 		// Dot objects
 		this.dots
-			.selectAll("dot")
-			.data(data)
-			.enter()
-			.append("circle")
-			  .attr("cx", function (d) { return x(d.x); } )
-			  .attr("cy", function (d) { return y(d.y); } )
+			.selectAll("circle")
+			.data(d3.range(data.n))
+			.join("circle")
+			  .attr("cx", i => x(xy[2 * i]))
+			  .attr("cy", i => y(xy[2 * i + 1]))
 			  .attr("r", r)
-			  .style("fill", d => color(d.c))
+			  .style("fill", i => color(colors[codes[i]]))
 
-		},
+	},
 
 });
 
@@ -55,6 +55,7 @@ setup_args = dict(
     include_package_data=True,
     install_requires=[
         'ipywidgets>=7.6.0',
+        'numpy',
     ],
     packages=find_packages(),
     zip_safe=False,
@@ -0,0 +1,62 @@
+import numpy as np
+import ipysimulate as ips
+from ipysimulate.checkpoints import Checkpoints
+
+
+class Decay:
+    """ Multiplies `x` by the parameter `k` per step. """
+
+    def __init__(self, k=0.2):
+        self.p = {'k': k}
+
+    def set_parameters(self, parameters):
+        self.p.update(parameters)
+
+    def sim_setup(self):
+        self.t = 0
+        self.x = 1.0
+        self.rng = np.random.default_rng(1)
+        self.running = True
+
+    def sim_step(self):
+        self.t += 1
+        self.x = self.x * self.p['k'] + self.rng.random()
+
+
+def test_rewind_keeps_current_parameters():
+    model = Decay()
+    control = ips.Control(model, parameters={'k': ips.Range(0, 1, 0.2)},
+                          checkpoints=5)
+    control.run_setup()
+    control.run_step(15)
+    control.update_parameter('k', 0.9)
+    control.join()
+    control._rewind(5)
+    assert model.t == 5 and model.p['k'] == 0.9
+    control.run_step(1)
+    assert model.p['k'] == 0.9
+    control.shutdown()
+
+
+def test_restore_is_exact():
+    model = Decay()
+    model.sim_setup()
+    store = Checkpoints(every=1)
+    store.save(model)
+    for _ in range(3):
+        model.sim_step()
+    x = model.x
+    store.restore(model, 0)
+    for _ in range(3):
+        model.sim_step()
+    assert model.x == x
+
+
+def test_first_and_latest_snapshots_are_kept():
+    model = Decay()
+    model.sim_setup()
+    store = Checkpoints(every=1, max_bytes=1)
+    for _ in range(5):
+        store.save(model)
+        model.sim_step()
+    assert store.times == [0, 4]
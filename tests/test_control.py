@@ -0,0 +1,400 @@
+import time
+import asyncio
+import collections
+import numpy as np
+import ipysimulate as ips
+
+
+class SlowModel:
+    """ Counts steps with a short delay, so that runs can be paused. """
+
+    def __init__(self, delay=0.001):
+        self.p = {}
+        self.delay = delay
+
+    def set_parameters(self, parameters):
+        self.p.update(parameters)
+
+    def sim_setup(self):
+        self.t = 0
+        self.running = True
+
+    def sim_step(self):
+        time.sleep(self.delay)
+        self.t += 1
+
+
+def wait_until(condition, timeout=5):
+    end = time.time() + timeout
+    while not condition():
+        assert time.time() < end, "Timed out"
+        time.sleep(0.005)
+
+
+def test_next_commands_coalescing():
+    control = ips.Control(SlowModel())
+    for command, kwargs in [('parameters', {}), ('step', {'steps': 1}),
+                            ('step', {'steps': 2}), ('run', {'epoch': 0}),
+                            ('run', {'epoch': 1}), ('rewind', {'t': 3}),
+                            ('rewind', {'t': 5})]:
+        control._commands.put((command, kwargs))
+    commands, received = control._next_commands()
+    assert received == 7
+    assert commands == [('parameters', {}), ('step', {'steps': 3}),
+                        ('run', {'epoch': 1}), ('rewind', {'t': 5})]
+
+    control._commands.put(('step', {'steps': 1}))
+    control._commands.put(('setup', {}))
+    control._commands.put(('step', {'steps': 1}))
+    commands, received = control._next_commands()
+    assert received == 3
+    assert commands == [('setup', {}), ('step', {'steps': 1})]
+
+
+def test_pause_cancels_queued_runs():
+    model = SlowModel()
+    control = ips.Control(model)
+    control.setup_simulation()
+    control.continue_simulation()
+    control.continue_simulation()  # Double-clicked play
+    wait_until(lambda: control.is_running)
+    control.is_running = False  # Pause
+    assert control.join(timeout=5)
+    t = model.t
+    time.sleep(0.05)
+    assert model.t == t and not control.is_running
+    control.shutdown()
+
+
+def test_run_after_pause_continues():
+    model = SlowModel()
+    control = ips.Control(model)
+    control.setup_simulation()
+    control.continue_simulation()
+    wait_until(lambda: control.is_running)
+    control.is_running = False
+    assert control.join(timeout=5)
+    t = model.t
+    control.run_simulation(t=t + 5)  # Runs after the pause are not affected
+    assert model.t == t + 5
+    control.shutdown()
+
+
+def test_queued_runs_after_stop_continue():
+    model = SlowModel(delay=0)
+    control = ips.Control(model)
+    control.setup_simulation()
+    control._submit('run', t=10)
+    control._submit('step', steps=1)  # Keeps the runs apart
+    control._submit('run', t=20)
+    assert control.join(timeout=5)
+    assert model.t == 20
+    control.shutdown()
+
+
+def test_shutdown_discards_queued_commands():
+    model = SlowModel()
+    control = ips.Control(model)
+    control.setup_simulation()
+    control.continue_simulation()
+    wait_until(lambda: control.is_running)
+    control.increment_simulation()
+    control.continue_simulation()
+    start = time.time()
+    control.shutdown(timeout=5)
+    assert time.time() - start < 1
+    assert not control.thread.is_alive()
+    assert control.join(timeout=0)
+    t = model.t
+    time.sleep(0.05)
+    assert model.t == t
+
+
+class CountingModel:
+    """ Increases the attribute `v` by one per step. """
+
+    def __init__(self):
+        self.p = {}
+
+    def set_parameters(self, parameters):
+        self.p.update(parameters)
+
+    def sim_setup(self):
+        self.t = 0
+        self.v = 0
+        self.running = True
+
+    def sim_step(self):
+        self.t += 1
+        self.v += 1
+
+
+def test_reset_collects_from_process():
+    control = ips.Control(CountingModel(), backend='process',
+                          max_in_flight=None)
+    widget = ips.CustomWidget(control, {}, data={'v': 'v'})
+    messages = []
+    widget.send = lambda content, buffers=None: messages.append(content)
+    control.run_setup()
+    control.run_step(3)
+    messages.clear()
+    control.reset()
+    assert [(m['what'], m['data']) for m in messages] == [
+        ('reset_data', {'v': 0}), ('new_data', {'v': 0})]
+    control.shutdown()
+
+
+class Outcome:
+    """ Ends with `b = 2 * a` after one step. """
+
+    def __init__(self):
+        self.p = {'a': 0}
+
+    def set_parameters(self, parameters):
+        self.p.update(parameters)
+
+    def sim_setup(self):
+        self.t = 0
+        self.b = 0
+        self.running = True
+
+    def sim_step(self):
+        self.t += 1
+        self.b = 2 * self.p['a']
+        self.running = False
+
+
+def test_sweep_accumulates_scatterplot():
+    control = ips.Control(Outcome(), parameters={'a': ips.Range(0, 1)})
+    scatter = ips.Scatterplot(
+        control, lambda m: [(m.p['a'], m.b)], c=lambda m: m.p['a'] > 0.5)
+    messages = []
+    scatter.send = lambda content, buffers=None: \
+        messages.append((content, buffers))
+    control.sweep(n=5, processes=2)
+    points = [content['n'] for content, _ in messages
+              if content['what'] in ('keyframe', 'delta')]
+    assert points == [1, 1, 1, 1, 1]  # Each run adds one point
+    assert len(scatter._sweep or []) == 0 and not scatter._in_flight
+    assert control.max_in_flight == 4
+
+
+def test_sweep_rejects_other_charts():
+    control = ips.Control(Outcome(), parameters={'a': ips.Range(0, 1)})
+    ips.Histogram(control, 'b')
+    try:
+        control.sweep(n=2)
+    except ValueError as e:
+        assert 'Histogram' in str(e)
+    else:
+        raise AssertionError("Sweep with a Histogram did not fail")
+
+
+class Walkers:
+    """ Moves agents that get a new category with each step. """
+
+    def __init__(self, n=3):
+        self.p = {}
+        self.n = n
+
+    def set_parameters(self, parameters):
+        self.p.update(parameters)
+
+    def sim_setup(self):
+        self.t = 0
+        self.running = True
+
+    def sim_step(self):
+        self.t += 1
+
+
+def test_scatterplot_sends_new_colors_only():
+    model = Walkers()
+    control = ips.Control(model, max_in_flight=None)
+    scatter = ips.Scatterplot(
+        control, lambda m: [(i, m.t) for i in range(m.n)],
+        c=lambda m: [f"{i}-{m.t}" for i in range(m.n)],
+        ids=lambda m: range(m.n), keyframe_every=3)
+    messages = []
+    scatter.send = lambda content, buffers=None: messages.append(content)
+    control.run_setup()
+    colors = list(messages[0]['colors'])
+    for _ in range(3):
+        control.run_step(1)
+        m = messages[-1]
+        if m['what'] == 'keyframe':
+            colors = list(m['colors'])
+        else:
+            assert 'colors' not in m
+            colors += m['new_colors']
+        assert colors == scatter._table.values
+    assert [m['what'] for m in messages] == [
+        'keyframe', 'delta', 'delta', 'keyframe']
+    assert colors == ['0-3', '1-3', '2-3']  # Unused colors are removed
+    control.shutdown()
+
+
+def test_ready_when_acknowledged_concurrently():
+    control = ips.Control(SlowModel(), max_in_flight=1)
+    widget = ips.CustomWidget(control, {}, data={'t': 't'})
+
+    class Acknowledged(collections.deque):
+        """ Empties itself between the length check and the read. """
+
+        def __len__(self):
+            n = super().__len__()
+            self.clear()
+            return n
+
+    widget._in_flight = Acknowledged([time.time()])
+    assert widget._ready()
+
+
+def test_asyncio_runs_commands_in_order():
+    async def main():
+        model = SlowModel(delay=0)
+        control = ips.Control(model, runner='asyncio')
+        control.setup_simulation()  # Run is queued after setup
+        await control.run_until(t=50)
+        assert model.t == 50
+        control.reset_simulation()
+        await control.run_until(t=20)
+        assert model.t == 20 and control.join(timeout=0)
+        control.shutdown()
+    asyncio.run(main())
+
+
+def test_asyncio_shutdown_stops_run():
+    async def main(executor):
+        model = SlowModel()
+        control = ips.Control(model, runner='asyncio', executor=executor)
+        control.setup_simulation()
+        control.continue_simulation()
+        while not control.is_running:
+            await asyncio.sleep(0.005)
+        control.increment_simulation()
+        try:
+            control.join()
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("join() did not fail within the event loop")
+        control.shutdown()
+        assert control.join(timeout=0)
+        t = model.t
+        await asyncio.sleep(0.05)
+        assert model.t == t
+    for executor in (False, True):
+        asyncio.run(main(executor))
+
+
+def test_commands_after_shutdown():
+    control = ips.Control(CountingModel(), backend='process')
+    control.run_setup()
+    control.run_step(2)
+    control.shutdown()
+    control.increment_simulation()  # Starts a new worker and process
+    assert control.join(timeout=5)
+    assert control.t == 1
+    control.shutdown()
+
+    control = ips.Control(SlowModel(delay=0))
+    control._submit('setup')
+    control._submit(None)  # Shutdown
+    control._submit('step', steps=1)  # Sent before the worker stops
+    assert control.join(timeout=5)
+    assert control.model.t == 1
+    control.shutdown()
+
+
+def test_new_frontend_requests_keyframe():
+    control = ips.Control(Walkers(), max_in_flight=None)
+    scatter = ips.Scatterplot(
+        control, lambda m: [(i, m.t) for i in range(m.n)],
+        ids=lambda m: range(m.n))
+    messages = []
+    scatter.send = lambda content, buffers=None: messages.append(content)
+    control.run_setup()
+    control.run_step(1)
+    messages.clear()
+    scatter._handle_frontend_msg(None, {'event': 'request_keyframe'}, [])
+    assert [(m['what'], m['n']) for m in messages] == [('keyframe', 3)]
+    control.shutdown()
+
+
+def test_new_frontend_requests_full_grid():
+    control = ips.Control(Walkers(), max_in_flight=None)
+    grid = ips.Gridplot(control, lambda m: [[m.t, 0], [0, 0]])
+    messages = []
+    grid.send = lambda content, buffers=None: \
+        messages.append((content, buffers))
+    control.run_setup()
+    control.run_step(1)
+    messages.clear()
+    grid._handle_frontend_msg(None, {'event': 'request_keyframe'}, [])
+    [(content, buffers)] = messages
+    assert content['encoding'] != 'delta'
+    assert bytes(buffers[0])[0] == 1  # Latest grid
+    control.shutdown()
+
+
+def test_sweep_sorts_lineplot_by_x():
+    control = ips.Control(Outcome(), parameters={'a': ips.Range(0, 1)})
+    line = ips.Lineplot(control, lambda m: m.b, ylabel='b',
+                        x=lambda m: m.p['a'], xlabel='a')
+    messages = []
+    line.send = lambda content, buffers=None: \
+        messages.append((content, buffers))
+    results = control.sweep(n=6, method='random', processes=2, seed=1)
+    content, buffers = messages[-1]
+    assert content['what'] == 'history'
+    meta = content['arrays']['x']
+    x = np.frombuffer(buffers[meta['buffer']], meta['dtype'])
+    assert x.tolist() == sorted(parameters['a'] for parameters, _ in results)
+
+
+def test_matplot_rejects_process_backend():
+    control = ips.Control(CountingModel(), backend='process')
+    try:
+        ips.Matplot(control, lambda model, fig, ax: None)
+    except ValueError as e:
+        assert 'process' in str(e)
+    else:
+        raise AssertionError("Matplot with backend='process' did not fail")
+    assert not control.charts
+
+
+def test_ack_counts_drawn_messages():
+    control = ips.Control(SlowModel())
+    widget = ips.CustomWidget(control, {}, data={'t': 't'})
+    widget._in_flight.extend([1, 2, 3])
+    widget._handle_frontend_msg(None, {'event': 'ack', 'n': 2}, [])
+    assert list(widget._in_flight) == [3]
+    widget._handle_frontend_msg(None, {'event': 'ack', 'n': 5}, [])
+    assert not widget._in_flight
+
+
+def test_history_keeps_precision_of_json_points():
+    control = ips.Control(CountingModel(), max_in_flight=None)
+    line = ips.Lineplot(control, 'v', x=lambda m: 2 ** 24 + m.t, xlabel='x')
+    messages = []
+    line.send = lambda content, buffers=None: \
+        messages.append((content, buffers))
+    control.run_setup()
+    control.run_step(1)
+    messages.clear()
+    line._handle_frontend_msg(None, {'event': 'request_history'}, [])
+    [(content, buffers)] = messages
+    meta = content['arrays']['x']
+    x = np.frombuffer(buffers[meta['buffer']], meta['dtype'])
+    assert x.tolist() == [2 ** 24, 2 ** 24 + 1]
+
+
+def test_matplot_blit_figure_arguments():
+    control = ips.Control(CountingModel())
+    plot = ips.Matplot(control, lambda model, fig, ax: None, 1, 2,
+                       blit=True, figsize=(4, 2), facecolor='red',
+                       constrained_layout=True, sharey=True)
+    assert len(plot._ax) == 2
+    assert plot._fig.get_facecolor() == (1, 0, 0, 1)
+    assert plot._fig.get_constrained_layout()
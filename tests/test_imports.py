@@ -0,0 +1,6 @@
+def test_star_import_exports_lazy_attributes():
+    namespace = {}
+    exec('from ipysimulate import *', namespace)
+    for name in ('Control', 'Lineplot', 'Scatterplot', 'CustomWidget',
+                 'Matplot', 'Range', 'Playback'):
+        assert name in namespace